@@ -1,13 +1,15 @@
 """
 FastAPI应用主文件
 """
+import asyncio
+import gc
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.device_api import router as device_router
 from config.settings import settings
 from utils.logger import logger
-from services import feeder_service, camera_service, sensor_service
+from services import feeder_service, camera_service, sensor_service, expert_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,13 +28,34 @@ async def lifespan(app: FastAPI):
     app.state.workflow = build_device_workflow()
     logger.info("✅ 工作流已预构建完成")
     
-    # 3. 启动定时任务调度器
+    # 3. 预创建传感器HTTP客户端，避免首次工具调用时的冷启动
+    await sensor_service.get_client()
+    
+    # 预热喂食机设备索引（登录并拉取设备列表），首轮工具调用按ID查设备时直接命中缓存
+    try:
+        await asyncio.to_thread(feeder_service.ensure_device_cache)
+    except Exception as e:
+        logger.warning(f"⚠️ 预热设备列表失败: {e}")
+    
+    # 4. 启动定时任务调度器
     from scheduler.task_scheduler import get_task_scheduler
     from services.schedule_service import get_schedule_service
     
     task_scheduler = get_task_scheduler()
     schedule_service = get_schedule_service()
     
+    # 建表/补索引、清理执行历史各自单独处理：共享库上缺少DDL或DELETE权限时不能影响任务加载
+    try:
+        from database.db_session import init_db
+        init_db()
+    except Exception as e:
+        logger.warning(f"⚠️ 初始化定时任务表失败: {e}")
+    
+    try:
+        schedule_service.prune_execution_history()
+    except Exception as e:
+        logger.warning(f"⚠️ 清理执行历史失败: {e}")
+    
     # 从数据库加载所有待执行的定时投喂任务
     try:
         loaded_count = schedule_service.load_pending_tasks()
@@ -44,6 +67,11 @@ async def lifespan(app: FastAPI):
     task_scheduler.start()
     logger.info("✅ 定时任务调度器已启动")
     
+    # 5. 启动期创建的常驻对象移入永久代，后续GC不再遍历
+    gc.collect()
+    gc.freeze()
+    logger.info(f"✅ 启动堆已冻结（{gc.get_freeze_count()} 个对象）")
+    
     yield
     
     # 关闭定时任务调度器
@@ -53,6 +81,7 @@ async def lifespan(app: FastAPI):
     feeder_service.close()  # 同步方法
     await camera_service.close()
     await sensor_service.close()
+    await expert_service.close()
     logger.info("👋 服务已关闭")
 
 
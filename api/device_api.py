@@ -7,11 +7,24 @@ from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, AsyncGenerator
 from langchain_core.messages import HumanMessage
 from utils.logger import logger
-import json
+from utils.json_utils import dumps
 import asyncio
 
 router = APIRouter()
 
+# 流式接口的非浏览器客户端可通过 Accept 头协商 NDJSON（每行一个JSON事件），省去 SSE 的 "data: " 前缀和空行分帧
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _sse_frame(event: Dict[str, Any]) -> str:
+    """按 SSE 格式封装一个事件"""
+    return f"data: {dumps(event)}\n\n"
+
+
+def _ndjson_frame(event: Dict[str, Any]) -> str:
+    """按 NDJSON 格式封装一个事件"""
+    return dumps(event) + "\n"
+
 
 class DeviceRequest(BaseModel):
     """设备操作请求"""
@@ -86,13 +99,17 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
     """
     设备控制对话接口（流式版本）
     
-    返回 SSE (Server-Sent Events) 格式的流式响应
+    返回 SSE (Server-Sent Events) 格式的流式响应；
+    请求头 Accept 包含 application/x-ndjson 时改为返回 NDJSON（每行一个JSON事件）
     支持完整的中间过程输出，包括：
     - 节点切换
     - 工具调用和结果
     - 专家咨询的完整流程
     - AI思考过程
     """
+    use_ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    frame = _ndjson_frame if use_ndjson else _sse_frame
+    
     async def event_generator() -> AsyncGenerator[str, None]:
         """生成 SSE 事件流"""
         try:
@@ -104,7 +121,7 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
             event_queue = asyncio.Queue()
             
             # 发送开始事件
-            yield f"data: {json.dumps({'type': 'start', 'session_id': session_id, 'query': device_request.query}, ensure_ascii=False)}\n\n"
+            yield frame({'type': 'start', 'session_id': session_id, 'query': device_request.query})
             
             # 使用预构建的工作流
             workflow = request.app.state.workflow
@@ -135,7 +152,7 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
                     event = await asyncio.wait_for(event_queue.get(), timeout=0.1)
                     
                     # 发送事件
-                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                    yield frame(event)
                     
                 except asyncio.TimeoutError:
                     # 超时，检查工作流是否完成
@@ -160,7 +177,7 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
                                 "device_type": device_type
                             }
                             
-                            yield f"data: {json.dumps(final_event, ensure_ascii=False)}\n\n"
+                            yield frame(final_event)
                             
                             logger.info(f"[Session: {session_id}] 流式任务执行完成: success={success}, device_type={device_type}")
                             
@@ -170,7 +187,7 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
                                 "type": "error",
                                 "error": str(e)
                             }
-                            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+                            yield frame(error_event)
             
         except Exception as e:
             logger.error(f"流式执行设备任务失败: {e}", exc_info=True)
@@ -178,11 +195,11 @@ async def chat_stream(device_request: DeviceRequest, request: Request):
                 "type": "error",
                 "error": str(e)
             }
-            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+            yield frame(error_event)
     
     return StreamingResponse(
         event_generator(),
-        media_type="text/event-stream",
+        media_type=NDJSON_MEDIA_TYPE if use_ndjson else "text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -62,6 +62,10 @@ class Settings(BaseSettings):
     SCHEDULER_CHECK_INTERVAL: int = 60  # 检查间隔（秒）
     SCHEDULER_MAX_WORKERS: int = 10     # 最大工作线程数
     
+    # ========== 工具调用配置 ==========
+    TOOL_CONCURRENCY: int = 8           # 批量工具调用的全局并发上限
+    TOOL_CATEGORY_CONCURRENCY: int = 4  # 每个工具类别（feeder/sensor等）的并发上限
+    
     # ========== 时区配置 ==========
     TIMEZONE: str = "Asia/Tokyo"  # 日本时区
     # TIMEZONE: str = "Asia/Shanghai"  # 中国时区
@@ -3,15 +3,18 @@
 参考: japan-aquaculture-project/backend copy/db_models/db_session.py
 """
 import logging
+import threading
 from contextlib import contextmanager
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 _engine = None
 _Session = None
+# 当前线程 db_session_factory 的嵌套深度
+_scope = threading.local()
 
 
 def get_engine():
@@ -40,20 +43,34 @@ def get_engine():
     return _engine
 
 
+def init_db():
+    """
+    创建缺失的数据表。
+
+    已存在的表（如复用的 tasks 表）会被跳过，只创建本服务新增的表。
+    """
+    from models import Base
+
+    Base.metadata.create_all(get_engine(), checkfirst=True)
+    logger.info("数据表检查完成。")
+
+
 def get_session_factory():
     """
     获取数据库会话工厂的单例实例。
 
     如果会话工厂不存在，则使用 get_engine() 获取的引擎创建一个新的会话工厂。
     这确保了所有的会话都绑定到同一个引擎上。
+    工厂以 scoped_session 包装（按线程复用会话），并关闭 expire_on_commit，
+    提交后访问已加载的属性无需再次往返数据库。
 
     Returns:
-        sessionmaker: SQLAlchemy 会话工厂。
+        scoped_session: 线程作用域的 SQLAlchemy 会话工厂。
     """
     global _Session
     if _Session is None:
         engine = get_engine()
-        _Session = sessionmaker(bind=engine)
+        _Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
     return _Session
 
 
@@ -62,9 +79,11 @@ def db_session_factory():
     """
     提供一个围绕一系列数据库操作的事务作用域。
 
-    这是一个上下文管理器，它从会话工厂获取一个新的数据库会话，
-    并在 `with` 块内提供该会话。如果代码块成功执行，则提交事务；
-    如果发生异常，则回滚事务。无论成功与否，会话最终都会被关闭。
+    这是一个上下文管理器，它从线程作用域的会话工厂获取数据库会话，
+    并在 `with` 块内提供该会话。事务由调用方显式提交（`session.commit()`），
+    未提交的修改在退出时丢弃；如果发生异常，则回滚事务。
+    同一线程内嵌套使用时共享同一个会话，只在最外层退出时移除当前线程的会话，
+    底层连接归还连接池复用。
 
     Usage:
         with db_session_factory() as session:
@@ -74,6 +93,8 @@ def db_session_factory():
     """
     session_factory = get_session_factory()
     session = session_factory()
+    depth = getattr(_scope, "depth", 0)
+    _scope.depth = depth + 1
     logger.debug("数据库会话已创建。")
     try:
         yield session
@@ -82,6 +103,8 @@ def db_session_factory():
         session.rollback()
         raise
     finally:
-        session.close()
-        logger.debug("数据库会话已关闭。")
-
+        _scope.depth = depth
+        # 嵌套的内层退出时不能移除会话，否则会关闭外层仍在使用的会话
+        if depth == 0:
+            session_factory.remove()
+            logger.debug("数据库会话已关闭。")
@@ -3,10 +3,10 @@ Agent 管理器 - 预创建和缓存所有设备 Agent
 """
 from typing import Optional, Dict, Any
 import asyncio
-import json
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
-import pytz
+import orjson
 from langchain.agents import create_agent
 from langchain.agents.middleware import ToolCallLimitMiddleware
 from langchain_core.callbacks import BaseCallbackHandler
@@ -42,7 +42,7 @@ class ToolLoggingCallback(BaseCallbackHandler):
             try:
                 # 解析输入参数
                 try:
-                    args = json.loads(input_str) if input_str else {}
+                    args = orjson.loads(input_str) if input_str else {}
                 except:
                     args = {"raw": input_str}
                 
@@ -66,7 +66,7 @@ class ToolLoggingCallback(BaseCallbackHandler):
             try:
                 # 尝试解析为JSON
                 try:
-                    result_data = json.loads(output_str)
+                    result_data = orjson.loads(output_str)
                 except:
                     result_data = {"raw": output_str[:500]}
                 
@@ -191,7 +191,7 @@ class DeviceAgentManager:
             raise RuntimeError("喂食机 Agent 未初始化")
         
         # 获取当前时间（使用配置的时区）
-        tz = pytz.timezone(settings.TIMEZONE)
+        tz = ZoneInfo(settings.TIMEZONE)
         current_time = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
         
         # 构建完整的用户消息（包含当前时间、设备列表和专家建议）
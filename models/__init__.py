@@ -2,7 +2,7 @@
 数据库模型模块
 """
 from models.base import Base
-from models.task import Task
+from models.task import Task, TaskExecution
 
-__all__ = ["Base", "Task"]
+__all__ = ["Base", "Task", "TaskExecution"]
 
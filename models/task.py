@@ -4,7 +4,7 @@
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, TIMESTAMP, text, Text
+from sqlalchemy import String, TIMESTAMP, text, Text, Integer, Boolean, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from models.base import Base
 
@@ -56,6 +56,33 @@ class Task(Base):
     completed_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True, default=None)
 
 
+class TaskExecution(Base):
+    """定时任务执行记录表模型（daily任务每次执行追加一行）"""
+    
+    __tablename__ = "task_executions"
+    __table_args__ = (
+        Index("ix_task_executions_task_id_executed_at", "task_id", "executed_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, init=False)
+    
+    # 所属任务（tasks.id）
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"), nullable=False)
+    
+    # 本次执行参数
+    device_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    feed_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # 是否执行成功
+    success: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    
+    # 执行时间
+    executed_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
+    
+    # 错误信息（可选）
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True, default=None)
+
+
 class TaskTopic:
     """任务类型常量"""
     SCHEDULE_FEED = "定时投喂"      # 定时喂食
@@ -3,21 +3,17 @@
 参考: ai_japan/src/scheduler/task_scheduler.py
 支持一次性任务和每天循环任务，使用系统配置时区
 """
-import json
-import time
 import logging
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Callable
 from concurrent.futures import ThreadPoolExecutor, Future
-
-import pytz
+from zoneinfo import ZoneInfo
 
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
-
 class ScheduledTask:
     """调度任务封装类"""
     
@@ -48,9 +44,9 @@ class ScheduledTask:
         self.feed_count = feed_count
         
         # 确保 scheduled_time 使用系统配置的时区
-        tz = pytz.timezone(settings.TIMEZONE)
+        tz = ZoneInfo(settings.TIMEZONE)
         if scheduled_time.tzinfo is None:
-            self.scheduled_time = tz.localize(scheduled_time)
+            self.scheduled_time = scheduled_time.replace(tzinfo=tz)
         else:
             self.scheduled_time = scheduled_time.astimezone(tz)
         
@@ -70,12 +66,12 @@ class ScheduledTask:
     
     def _calculate_initial_next_run(self, scheduled_time: datetime) -> Optional[datetime]:
         """计算初始的下次执行时间"""
-        tz = pytz.timezone(settings.TIMEZONE)
+        tz = ZoneInfo(settings.TIMEZONE)
         now = datetime.now(tz)
         
         # 确保 scheduled_time 的时区与系统时区一致
         if scheduled_time.tzinfo is None:
-            scheduled_time = tz.localize(scheduled_time)
+            scheduled_time = scheduled_time.replace(tzinfo=tz)
         else:
             scheduled_time = scheduled_time.astimezone(tz)
         
@@ -88,7 +84,7 @@ class ScheduledTask:
             )
             # 确保 next_time 也有正确的时区
             if next_time.tzinfo is None:
-                next_time = tz.localize(next_time)
+                next_time = next_time.replace(tzinfo=tz)
             else:
                 next_time = next_time.astimezone(tz)
             
@@ -111,7 +107,7 @@ class ScheduledTask:
             # 确保 scheduled_time 的时区与系统时区一致
             scheduled_time = self.scheduled_time
             if scheduled_time.tzinfo is None:
-                scheduled_time = tz.localize(scheduled_time)
+                scheduled_time = scheduled_time.replace(tzinfo=tz)
             else:
                 scheduled_time = scheduled_time.astimezone(tz)
             
@@ -122,7 +118,7 @@ class ScheduledTask:
             )
             # 确保 next_time 也有正确的时区
             if next_time.tzinfo is None:
-                next_time = tz.localize(next_time)
+                next_time = next_time.replace(tzinfo=tz)
             else:
                 next_time = next_time.astimezone(tz)
             
@@ -166,7 +162,7 @@ class TaskScheduler:
         self.lock = threading.Lock()
         
         # 时区配置
-        self.tz = pytz.timezone(settings.TIMEZONE)
+        self.tz = ZoneInfo(settings.TIMEZONE)
         
         # 调度配置
         self.check_interval = settings.SCHEDULER_CHECK_INTERVAL
@@ -200,6 +196,27 @@ class TaskScheduler:
             logger.info(f"✅ 任务添加成功: {task.task_id}, 计划执行时间: {task.next_run}")
             return True
     
+    def add_tasks_bulk(self, tasks: List[ScheduledTask]) -> int:
+        """
+        批量添加任务到调度器（只获取一次锁）
+        
+        Args:
+            tasks: 调度任务列表
+            
+        Returns:
+            实际添加的任务数量
+        """
+        added = 0
+        with self.lock:
+            for task in tasks:
+                if task.task_id in self.tasks:
+                    logger.warning(f"任务已存在: {task.task_id}")
+                    continue
+                self.tasks[task.task_id] = task
+                added += 1
+        logger.info(f"✅ 批量添加任务成功: {added}/{len(tasks)}")
+        return added
+    
     def remove_task(self, task_id: str) -> bool:
         """
         移除任务
@@ -252,7 +269,7 @@ class TaskScheduler:
                 # 确保新的 scheduled_time 使用系统配置的时区
                 new_scheduled_time = kwargs['scheduled_time']
                 if new_scheduled_time.tzinfo is None:
-                    task.scheduled_time = self.tz.localize(new_scheduled_time)
+                    task.scheduled_time = new_scheduled_time.replace(tzinfo=self.tz)
                 else:
                     task.scheduled_time = new_scheduled_time.astimezone(self.tz)
                 # 重新计算 next_run
@@ -265,9 +282,40 @@ class TaskScheduler:
             logger.info(f"✅ 任务更新成功: {task_id}")
             return True
     
-    def get_task(self, task_id: str) -> Optional[ScheduledTask]:
-        """获取任务"""
-        return self.tasks.get(task_id)
+    def reschedule(self, task_id: str, scheduled_time: datetime) -> bool:
+        """
+        仅修改任务的执行时间（update_task 的轻量版本）
+        
+        Args:
+            task_id: 任务ID
+            scheduled_time: 新的计划执行时间
+            
+        Returns:
+            是否修改成功
+        """
+        if scheduled_time.tzinfo is None:
+            scheduled_time = scheduled_time.replace(tzinfo=self.tz)
+        else:
+            scheduled_time = scheduled_time.astimezone(self.tz)
+        
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                logger.warning(f"任务不存在: {task_id}")
+                return False
+            
+            task.scheduled_time = scheduled_time
+            next_run = task._calculate_initial_next_run(scheduled_time)
+            task.next_run = next_run
+        
+        logger.info(f"✅ 任务执行时间已更新: {task_id}, 下次执行: {next_run}")
+        return True
+    
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务信息快照（在锁内生成，调用方拿到的是副本而不是调度器持有的实例）"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            return task.get_info() if task else None
     
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """获取所有任务信息"""
@@ -351,8 +399,8 @@ class TaskScheduler:
     def _run_task(self, task: ScheduledTask):
         """运行任务（在线程池中执行）"""
         try:
-            # 执行喂食操作（传递mode参数）
-            success = task.execute_func(task.device_id, task.feed_count, task.task_id, task.mode)
+            # 执行喂食操作（传递mode参数与数据库主键）
+            success = task.execute_func(task.device_id, task.feed_count, task.task_id, task.mode, task.db_id)
             
             if success:
                 task.success_count += 1
@@ -369,19 +417,23 @@ class TaskScheduler:
             logger.error(f"❌ 任务执行异常: {task.task_id}, 错误: {e}", exc_info=True)
         
         finally:
-            task.is_running = False
-            
             # 计算下次执行时间
-            task.next_run = task.calculate_next_run(self.tz)
+            task_id = task.task_id
+            next_run = task.calculate_next_run(self.tz)
+            
+            # 执行标记与下次执行时间在锁内更新，调度循环在锁内读取
+            with self.lock:
+                task.next_run = next_run
+                task.is_running = False
+                # 一次性任务执行完毕，从调度器移除（但不从数据库删除）；
+                # 执行期间已被 remove_task 移除的不再处理
+                if next_run is None and self.tasks.get(task_id) is task:
+                    del self.tasks[task_id]
             
-            if task.next_run:
-                logger.info(f"📅 任务 {task.task_id} 下次执行时间: {task.next_run}")
+            if next_run:
+                logger.info(f"📅 任务 {task_id} 下次执行时间: {next_run}")
             else:
-                # 一次性任务执行完毕，从调度器移除（但不从数据库删除）
-                logger.info(f"📋 一次性任务 {task.task_id} 执行完毕")
-                with self.lock:
-                    if task.task_id in self.tasks:
-                        del self.tasks[task.task_id]
+                logger.info(f"📋 一次性任务 {task_id} 执行完毕")
     
     def _cleanup_futures(self):
         """清理已完成的Future对象"""
@@ -27,9 +27,13 @@ class CameraService:
         供Tool层使用
         """
         if self._client is None or self._client.is_closed:
+            # HTTP/2 + keep-alive：连续的拍照/开始推流/停止推流复用同一条多路复用连接，
+            # 空闲连接保留到下一次工具调用，避免每次重新握手
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
-                timeout=self.timeout,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=85.0),
+                timeout=httpx.Timeout(self.timeout, connect=2.0),
                 headers={
                     "Authorization": f"Bearer {self.api_key}" if self.api_key else "",
                     "Content-Type": "application/json"
@@ -28,6 +28,27 @@ class ExpertConsultationService:
         self.api_key = settings.EXPERT_API_KEY
         self.timeout = settings.EXPERT_API_TIMEOUT
         self.agent_type = "japan"  # 固定为 "japan"
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    async def get_client(self) -> httpx.AsyncClient:
+        """
+        获取HTTP客户端（单例、懒加载）
+        多次专家咨询复用同一个 HTTP/2 连接池，避免每次重新握手
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(self.timeout, connect=3.0),
+                limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=90),
+            )
+            logger.debug("创建新的专家咨询HTTP客户端")
+        return self._client
+    
+    async def close(self):
+        """关闭连接"""
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("专家咨询HTTP客户端已关闭")
         
     async def consult(
         self,
@@ -78,86 +99,86 @@ class ExpertConsultationService:
                 headers["Authorization"] = f"Bearer {self.api_key}"
             
             # 发送GET请求（SSE流式）
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                logger.info(f"咨询外部专家 (SSE): {query[:50]}...")
-                
-                url = f"{self.base_url}/chat/stream"
-                
-                async with client.stream(
-                    "GET",
-                    url,
-                    params=params,
-                    headers=headers,
-                ) as response:
-                    # 检查状态码
-                    if response.status_code != 200:
-                        error_text = ""
-                        try:
-                            async for chunk in response.aiter_bytes():
-                                error_text += chunk.decode('utf-8', errors='ignore')
-                                if len(error_text) > 1000:
-                                    break
-                        except Exception:
-                            pass
-                        
-                        error_msg = f"HTTP {response.status_code}"
-                        if error_text:
-                            error_msg = f"{error_msg}: {error_text[:200]}"
-                        
-                        logger.error(f"专家咨询HTTP错误: {error_msg}")
-                        return {
-                            "success": False,
-                            "error": f"HTTP错误: {response.status_code}",
-                            "answer": None,
-                        }
+            client = await self.get_client()
+            logger.info(f"咨询外部专家 (SSE): {query[:50]}...")
+            
+            url = f"{self.base_url}/chat/stream"
+            
+            async with client.stream(
+                "GET",
+                url,
+                params=params,
+                headers=headers,
+            ) as response:
+                # 检查状态码
+                if response.status_code != 200:
+                    error_text = ""
+                    try:
+                        async for chunk in response.aiter_bytes():
+                            error_text += chunk.decode('utf-8', errors='ignore')
+                            if len(error_text) > 1000:
+                                break
+                    except Exception:
+                        pass
                     
-                    # 读取SSE流式响应
-                    answer_parts = []
-                    async for line in response.aiter_lines():
-                        if not line.strip():
-                            continue
-                        
-                        # SSE格式: "data: {json}"
-                        if line.startswith("data: "):
-                            data_str = line[6:]
-                            try:
-                                data = json.loads(data_str)
-                                # 收集答案片段
-                                if "content" in data or "text" in data or "answer" in data:
-                                    content = data.get("content") or data.get("text") or data.get("answer", "")
-                                    if content:
-                                        answer_parts.append(content)
-                                # 检查是否完成
-                                if data.get("done", False) or data.get("finished", False):
-                                    break
-                            except json.JSONDecodeError:
-                                if data_str.strip():
-                                    answer_parts.append(data_str)
+                    error_msg = f"HTTP {response.status_code}"
+                    if error_text:
+                        error_msg = f"{error_msg}: {error_text[:200]}"
                     
-                    # 合并所有答案片段
-                    answer = "".join(answer_parts)
+                    logger.error(f"专家咨询HTTP错误: {error_msg}")
+                    return {
+                        "success": False,
+                        "error": f"HTTP错误: {response.status_code}",
+                        "answer": None,
+                    }
+                
+                # 读取SSE流式响应
+                answer_parts = []
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
                     
-                    if answer:
-                        logger.info(f"专家咨询成功: {answer[:50]}...")
-                        return {
-                            "success": True,
-                            "answer": answer,
-                            "confidence": 1.0,
-                            "sources": [],
-                            "metadata": {
-                                "agent_type": self.agent_type,
-                                "session_id": session_id,
-                                "response_type": "sse_stream",
-                            },
-                        }
-                    else:
-                        logger.warning("专家咨询返回空答案")
-                        return {
-                            "success": False,
-                            "error": "专家咨询返回空答案",
-                            "answer": None,
-                        }
+                    # SSE格式: "data: {json}"
+                    if line.startswith("data: "):
+                        data_str = line[6:]
+                        try:
+                            data = json.loads(data_str)
+                            # 收集答案片段
+                            if "content" in data or "text" in data or "answer" in data:
+                                content = data.get("content") or data.get("text") or data.get("answer", "")
+                                if content:
+                                    answer_parts.append(content)
+                            # 检查是否完成
+                            if data.get("done", False) or data.get("finished", False):
+                                break
+                        except json.JSONDecodeError:
+                            if data_str.strip():
+                                answer_parts.append(data_str)
                 
+                # 合并所有答案片段
+                answer = "".join(answer_parts)
+                
+                if answer:
+                    logger.info(f"专家咨询成功: {answer[:50]}...")
+                    return {
+                        "success": True,
+                        "answer": answer,
+                        "confidence": 1.0,
+                        "sources": [],
+                        "metadata": {
+                            "agent_type": self.agent_type,
+                            "session_id": session_id,
+                            "response_type": "sse_stream",
+                        },
+                    }
+                else:
+                    logger.warning("专家咨询返回空答案")
+                    return {
+                        "success": False,
+                        "error": "专家咨询返回空答案",
+                        "answer": None,
+                    }
+            
         except httpx.TimeoutException:
             logger.error(f"专家咨询超时: {query[:50]}...")
             return {
@@ -233,107 +254,107 @@ class ExpertConsultationService:
                     logger.error(f"推送expert_start事件失败: {e}")
             
             # 发送GET请求（SSE流式）
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                logger.info(f"咨询外部专家 (流式): {query[:50]}...")
-                
-                url = f"{self.base_url}/chat/stream"
-                
-                async with client.stream(
-                    "GET",
-                    url,
-                    params=params,
-                    headers=headers,
-                ) as response:
-                    # 检查状态码
-                    if response.status_code != 200:
-                        error_msg = f"HTTP {response.status_code}"
-                        logger.error(f"专家咨询HTTP错误: {error_msg}")
-                        
-                        if event_queue:
-                            event_queue.put_nowait({
-                                "type": "expert_error",
-                                "error": error_msg,
-                                "message": f"❌ 专家咨询失败: {error_msg}"
-                            })
-                        
-                        return {
-                            "success": False,
+            client = await self.get_client()
+            logger.info(f"咨询外部专家 (流式): {query[:50]}...")
+            
+            url = f"{self.base_url}/chat/stream"
+            
+            async with client.stream(
+                "GET",
+                url,
+                params=params,
+                headers=headers,
+            ) as response:
+                # 检查状态码
+                if response.status_code != 200:
+                    error_msg = f"HTTP {response.status_code}"
+                    logger.error(f"专家咨询HTTP错误: {error_msg}")
+                    
+                    if event_queue:
+                        event_queue.put_nowait({
+                            "type": "expert_error",
                             "error": error_msg,
-                            "answer": None,
-                        }
+                            "message": f"❌ 专家咨询失败: {error_msg}"
+                        })
+                    
+                    return {
+                        "success": False,
+                        "error": error_msg,
+                        "answer": None,
+                    }
+                
+                # 读取SSE流式响应并转发到事件队列
+                answer_parts = []
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
                     
-                    # 读取SSE流式响应并转发到事件队列
-                    answer_parts = []
-                    async for line in response.aiter_lines():
-                        if not line.strip():
-                            continue
+                    # SSE格式: "data: {json}"
+                    if line.startswith("data: "):
+                        data_str = line[6:]
                         
-                        # SSE格式: "data: {json}"
-                        if line.startswith("data: "):
-                            data_str = line[6:]
-                            
-                            # 转发原始流式内容到事件队列
-                            if event_queue:
-                                try:
-                                    event_queue.put_nowait({
-                                        "type": "expert_stream",
-                                        "content": data_str,
-                                        "message": data_str[:200]  # 预览
-                                    })
-                                except Exception as e:
-                                    logger.error(f"推送expert_stream事件失败: {e}")
-                            
+                        # 转发原始流式内容到事件队列
+                        if event_queue:
                             try:
-                                data = json.loads(data_str)
-                                # 收集答案片段
-                                if "content" in data or "text" in data or "answer" in data:
-                                    content = data.get("content") or data.get("text") or data.get("answer", "")
-                                    if content:
-                                        answer_parts.append(content)
-                                
-                                # 检查是否完成
-                                if data.get("done", False) or data.get("finished", False):
-                                    break
-                            except json.JSONDecodeError:
-                                # 不是JSON，直接作为文本
-                                if data_str.strip():
-                                    answer_parts.append(data_str)
-                    
-                    # 合并所有答案片段
-                    answer = "".join(answer_parts)
-                    
-                    # 推送专家完成事件
-                    if event_queue:
+                                event_queue.put_nowait({
+                                    "type": "expert_stream",
+                                    "content": data_str,
+                                    "message": data_str[:200]  # 预览
+                                })
+                            except Exception as e:
+                                logger.error(f"推送expert_stream事件失败: {e}")
+                        
                         try:
-                            event_queue.put_nowait({
-                                "type": "expert_done",
-                                "answer": answer[:500],  # 截断避免过长
-                                "message": f"✅ 专家咨询完成（共 {len(answer)} 字符）"
-                            })
-                        except Exception as e:
-                            logger.error(f"推送expert_done事件失败: {e}")
-                    
-                    if answer:
-                        logger.info(f"专家咨询成功: {answer[:50]}...")
-                        return {
-                            "success": True,
-                            "answer": answer,
-                            "confidence": 1.0,
-                            "sources": [],
-                            "metadata": {
-                                "agent_type": self.agent_type,
-                                "session_id": session_id,
-                                "response_type": "sse_stream",
-                            },
-                        }
-                    else:
-                        logger.warning("专家咨询返回空答案")
-                        return {
-                            "success": False,
-                            "error": "专家咨询返回空答案",
-                            "answer": None,
-                        }
+                            data = json.loads(data_str)
+                            # 收集答案片段
+                            if "content" in data or "text" in data or "answer" in data:
+                                content = data.get("content") or data.get("text") or data.get("answer", "")
+                                if content:
+                                    answer_parts.append(content)
+                            
+                            # 检查是否完成
+                            if data.get("done", False) or data.get("finished", False):
+                                break
+                        except json.JSONDecodeError:
+                            # 不是JSON，直接作为文本
+                            if data_str.strip():
+                                answer_parts.append(data_str)
+                
+                # 合并所有答案片段
+                answer = "".join(answer_parts)
                 
+                # 推送专家完成事件
+                if event_queue:
+                    try:
+                        event_queue.put_nowait({
+                            "type": "expert_done",
+                            "answer": answer[:500],  # 截断避免过长
+                            "message": f"✅ 专家咨询完成（共 {len(answer)} 字符）"
+                        })
+                    except Exception as e:
+                        logger.error(f"推送expert_done事件失败: {e}")
+                
+                if answer:
+                    logger.info(f"专家咨询成功: {answer[:50]}...")
+                    return {
+                        "success": True,
+                        "answer": answer,
+                        "confidence": 1.0,
+                        "sources": [],
+                        "metadata": {
+                            "agent_type": self.agent_type,
+                            "session_id": session_id,
+                            "response_type": "sse_stream",
+                        },
+                    }
+                else:
+                    logger.warning("专家咨询返回空答案")
+                    return {
+                        "success": False,
+                        "error": "专家咨询返回空答案",
+                        "answer": None,
+                    }
+            
         except httpx.TimeoutException:
             logger.error(f"专家咨询超时: {query[:50]}...")
             
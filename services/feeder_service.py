@@ -3,9 +3,15 @@
 """
 喂食机服务 - 封装IoT API调用
 """
+import copy
+import ssl
 import time
+import threading
+import certifi
+import orjson
 import requests
-from typing import Dict, Any, Optional, List, Callable, TypeVar, cast
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, List, Tuple, Callable, TypeVar, cast
 from functools import wraps
 from config.settings import settings
 from utils.logger import logger
@@ -13,56 +19,78 @@ from utils.logger import logger
 # 定义泛型类型
 T = TypeVar('T')
 
+# 设备列表缓存有效期（秒），命中时 find_device 无需再请求云端
+DEVICE_CACHE_TTL = 60
 
-def auto_retry_on_auth_error(func: Callable[..., T]) -> Callable[..., T]:
+
+def auto_retry_on_auth_error(default: Any = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
     """
-    装饰器：当遇到 authkey 失效（status=7）时自动重新登录并重试
+    装饰器：调用前确保已登录；当遇到 authkey 失效（status=7）时自动重新登录并重试
     
     使用场景：
+    - 未登录时先登录，登录失败直接返回 default（被装饰方法可假定 authkey 已就绪）
     - API 返回 status=7（authkey 过期）
     - 自动清空 authkey
     - 重新登录获取新 authkey
     - 重试原操作一次（避免无限递归）
+    
+    Args:
+        default: 登录失败时的返回值（返回其浅拷贝，避免共享可变对象）
     """
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        # 标记是否是重试调用（避免无限递归）
-        is_retry = kwargs.pop('_is_retry', False)
-        
-        # 第一次尝试
-        result = func(self, *args, **kwargs)
-        
-        # 如果已经是重试调用，直接返回结果
-        if is_retry:
-            return result
-        
-        # 检查是否需要重试（检测 status=7 的情况）
-        need_retry = False
-        
-        # 检查最后一次 API 调用是否返回 status=7
-        if hasattr(self, '_last_api_status') and self._last_api_status == 7:
-            need_retry = True
-            logger.warning(f"⚠️ 检测到 authkey 失效 (status=7)，尝试重新登录...")
-        
-        # 如果需要重试
-        if need_retry and self.authkey:
-            # 清空旧的 authkey
-            old_authkey = self.authkey[:10] if self.authkey else "None"
-            self.authkey = None
-            logger.info(f"🔄 清空旧 authkey: {old_authkey}...")
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            # 统一的调用前登录检查
+            if not self._ensure_login():
+                logger.error(f"登录失败，无法执行 {func.__name__}")
+                return copy.copy(default)
             
-            # 尝试重新登录
-            if self.login():
-                logger.info(f"✅ 重新登录成功，authkey: {self.authkey[:10]}..., 重试操作: {func.__name__}")
-                # 标记为重试调用，避免无限递归
-                kwargs['_is_retry'] = True
-                result = func(self, *args, **kwargs)
-            else:
-                logger.error("❌ 重新登录失败，返回失败结果")
+            # 第一次尝试（记下本次使用的 authkey；status 按线程记录，先清空上一次调用的结果）
+            stale_authkey = self.authkey
+            self._last_api_status = None
+            result = func(self, *args, **kwargs)
+            
+            # 检查本线程这次 API 调用是否返回 status=7
+            if self._last_api_status == 7 and stale_authkey:
+                logger.warning(f"⚠️ 检测到 authkey 失效 (status=7)，尝试重新登录...")
+                
+                # 多线程同时遇到失效时只由一个线程重新登录：
+                # authkey 已不是失效的那个，说明其他线程已刷新，直接用新的重试
+                with self._login_lock:
+                    if self.authkey == stale_authkey:
+                        self.authkey = None
+                        logger.info(f"🔄 清空旧 authkey: {stale_authkey[:10]}...")
+                        self.login()
+                    fresh_authkey = self.authkey
+                
+                # 只重试一次，直接调用原函数避免无限递归
+                if fresh_authkey:
+                    logger.info(f"✅ 重新登录成功，authkey: {fresh_authkey[:10]}..., 重试操作: {func.__name__}")
+                    result = func(self, *args, **kwargs)
+                else:
+                    logger.error("❌ 重新登录失败，返回失败结果")
+            
+            return result
         
-        return result
+        return cast(Callable[..., T], wrapper)
+    
+    return decorator
+
+
+class FeederAPIError(Exception):
+    """喂食机云端API请求失败（网络错误或响应无法解析）"""
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """挂载预先加载好的 SSLContext，避免首次请求时再解析 CA 证书包"""
+    
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
     
-    return cast(Callable[..., T], wrapper)
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
 
 
 class FeederService:
@@ -75,8 +103,40 @@ class FeederService:
         self.base_url = settings.AIJ_FEEDER_BASE_URL
         self.timeout = settings.AIJ_FEEDER_TIMEOUT
         self.authkey: Optional[str] = None
+        self._login_lock = threading.Lock()
+        self._device_refresh_lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context(cafile=certifi.where())
         self._session = requests.Session()
-        self._last_api_status: Optional[int] = None  # 记录最后一次API调用的status
+        # 服务为常驻进程，TLS 握手只发生在建连时；连接池容量与调度器工作线程数一致，
+        # 保证并发执行的定时任务都能复用已握手的 keep-alive 连接
+        self._session.mount("https://", _SSLContextAdapter(
+            self._ssl_context,
+            pool_connections=1,
+            pool_maxsize=settings.SCHEDULER_MAX_WORKERS,
+        ))
+        # 请求体由 orjson 序列化，Content-Type 在会话级别只设置一次
+        self._session.headers["Content-Type"] = "application/json"
+        # 固定端点的 PreparedRequest 只准备一次，每次调用 copy 后仅替换 body
+        # （copy 而不是加锁复用，避免调度器多线程并发调用时串行化网络请求）
+        self._prepared = self._session.prepare_request(requests.Request("POST", self.base_url))
+        self._local = threading.local()  # 按线程记录最后一次API调用的status
+        
+        # 设备列表索引（由 get_devices 刷新）
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._names_lower: List[Tuple[str, Dict[str, Any]]] = []  # (小写设备名, 设备)，供模糊匹配
+        self._device_cache_ts = 0.0
+        
+        # 各接口请求体的静态部分，调用时 copy 后只填充可变字段
+        self._tmpl_feed: Dict[str, Any] = {"msgType": 2001, "userID": self.user_id}
+        self._tmpl_list: Dict[str, Any] = {"msgType": 1401, "userID": self.user_id}
+        self._tmpl_status: Dict[str, Any] = {
+            "msgType": 1402,  # 获取设备状态的消息类型
+            "userID": self.user_id,
+            "groupID": "",  # 必需参数，空字符串表示查询所有分组
+            "pageIndex": 0,  # 分页参数
+            "pageSize": 50,  # 分页大小
+        }
         
         if not self.user_id or not self.password:
             logger.warning("未配置喂食机凭证（AIJ_FEEDER_USER/AIJ_FEEDER_PASS）")
@@ -84,22 +144,44 @@ class FeederService:
             logger.info(f"喂食机服务初始化: user={self.user_id}, url={self.base_url}")
     
     def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """发送POST请求"""
+        """
+        发送POST请求
+        
+        Returns:
+            解析后的响应数据
+        
+        Raises:
+            FeederAPIError: 请求或响应解析失败
+        """
         try:
-            resp = self._session.post(
-                self.base_url, 
-                json=payload, 
+            body = orjson.dumps(payload)
+            req = self._prepared.copy()
+            req.body = body
+            req.headers["Content-Length"] = str(len(body))
+            # stream=True 后一次性读取原始字节交给 orjson，
+            # 跳过 resp.content 的分块拼接拷贝
+            resp = self._session.send(
+                req, 
+                stream=True,
                 verify=True, 
                 timeout=self.timeout
             )
-            return {
-                "success": True, 
-                "status_code": resp.status_code, 
-                "data": resp.json()
-            }
+            try:
+                return orjson.loads(resp.raw.read(decode_content=True))
+            finally:
+                resp.raw.release_conn()
         except Exception as e:
             logger.error(f"API请求失败: {e}")
-            return {"success": False, "error": str(e)}
+            raise FeederAPIError(str(e)) from e
+    
+    @property
+    def _last_api_status(self) -> Optional[int]:
+        """当前线程最后一次API调用的status（并发调用时互不覆盖）"""
+        return getattr(self._local, "status", None)
+    
+    @_last_api_status.setter
+    def _last_api_status(self, status: Optional[int]):
+        self._local.status = status
     
     def login(self) -> bool:
         """登录获取authkey"""
@@ -113,28 +195,36 @@ class FeederService:
             "password": self.password,
         }
         logger.info(f"尝试登录喂食机: userID={self.user_id}")
-        result = self._post(payload)
+        try:
+            data = self._post(payload)
+        except FeederAPIError as e:
+            logger.error(f"❌ 登录请求失败: {e}")
+            return False
         
-        if result.get("success"):
-            data = result.get("data", {})
-            status = data.get("status")
-            logger.info(f"登录 API 响应: status={status}")
-            
-            if status == 1:
-                self.authkey = data["data"][0]["authkey"]
-                logger.info(f"✅ 喂食机登录成功: authkey={self.authkey[:10]}...")
-                return True
-            else:
-                error_msg = data.get("msg") or data.get("message") or "未知错误"
-                logger.error(f"❌ 登录失败: status={status}, 原因: {error_msg}")
-                return False
+        status = data.get("status")
+        logger.info(f"登录 API 响应: status={status}")
+        
+        if status == 1:
+            self.authkey = data["data"][0]["authkey"]
+            logger.info(f"✅ 喂食机登录成功: authkey={self.authkey[:10]}...")
+            return True
         else:
-            error = result.get("error", "未知错误")
-            logger.error(f"❌ 登录请求失败: {error}")
+            error_msg = data.get("msg") or data.get("message") or "未知错误"
+            logger.error(f"❌ 登录失败: status={status}, 原因: {error_msg}")
             return False
     
-    @auto_retry_on_auth_error
-    def feed(self, dev_id: str, count: int = 1, **kwargs) -> bool:
+    def _ensure_login(self) -> bool:
+        """确保已登录；多线程并发调用时只由一个线程执行登录"""
+        if self.authkey:
+            return True
+        with self._login_lock:
+            if self.authkey:
+                return True
+            logger.info("未登录，尝试登录...")
+            return self.login()
+    
+    @auto_retry_on_auth_error(default=False)
+    def feed(self, dev_id: str, count: int = 1) -> bool:
         """
         执行喂食操作
         
@@ -145,48 +235,34 @@ class FeederService:
         Returns:
             bool: 喂食是否成功
         """
-        # 清理装饰器传递的内部参数
-        kwargs.pop('_is_retry', None)
+        payload = self._tmpl_feed.copy()
+        payload["authkey"] = self.authkey
+        payload["devID"] = dev_id
+        payload["feedCount"] = count
+        logger.info("发送喂食请求: devID=%s, count=%s", dev_id, count)
+        try:
+            data = self._post(payload)
+        except FeederAPIError as e:
+            logger.error(f"❌ 喂食请求失败: {e}")
+            return False
         
-        if not self.authkey:
-            logger.info("未登录，尝试登录...")
-            if not self.login():
-                logger.error("登录失败，无法执行喂食操作")
-                return False
+        status = data.get("status")
+        self._last_api_status = status  # 记录 status
+        logger.info("API 响应: status=%s, data=%s", status, data)
         
-        payload = {
-            "msgType": 2001,
-            "authkey": self.authkey,
-            "userID": self.user_id,
-            "devID": dev_id,
-            "feedCount": count,
-        }
-        logger.info(f"发送喂食请求: devID={dev_id}, count={count}")
-        result = self._post(payload)
-        
-        if result.get("success"):
-            data = result.get("data", {})
-            status = data.get("status")
-            self._last_api_status = status  # 记录 status
-            logger.info(f"API 响应: status={status}, data={data}")
+        if status == 1:
+            logger.info("✅ 喂食成功: %s份 -> 设备 %s", count, dev_id)
             
-            if status == 1:
-                logger.info(f"✅ 喂食成功: {count}份 -> 设备 {dev_id}")
-                
-                # 上传喂食记录到后端服务器
-                try:
-                    self._upload_feed_record(dev_id, count)
-                except Exception as e:
-                    logger.warning(f"⚠️ 上传喂食记录失败（不影响喂食操作）: {e}")
-                
-                return True
-            else:
-                error_msg = data.get("msg") or data.get("message") or "未知错误"
-                logger.error(f"❌ 喂食失败: status={status}, 原因: {error_msg}, 完整响应: {data}")
-                return False
+            # 上传喂食记录到后端服务器
+            try:
+                self._upload_feed_record(dev_id, count)
+            except Exception as e:
+                logger.warning(f"⚠️ 上传喂食记录失败（不影响喂食操作）: {e}")
+            
+            return True
         else:
-            error = result.get("error", "未知错误")
-            logger.error(f"❌ 喂食请求失败: {error}")
+            error_msg = data.get("msg") or data.get("message") or "未知错误"
+            logger.error(f"❌ 喂食失败: status={status}, 原因: {error_msg}, 完整响应: {data}")
             return False
     
     def _upload_feed_record(self, dev_id: str, feed_count: int):
@@ -222,54 +298,42 @@ class FeederService:
             timestamp=timestamp_ms
         )
         
-        logger.info(f"✅ 喂食记录上传成功: feeder_id={feeder_id}, feed_amount_g={feed_amount_g}g, result={result}")
+        logger.info("✅ 喂食记录上传成功: feeder_id=%s, feed_amount_g=%sg, result=%s", feeder_id, feed_amount_g, result)
     
-    @auto_retry_on_auth_error
-    def get_devices(self, page_index: int = 0, page_size: int = 50, **kwargs) -> List[Dict[str, Any]]:
+    @auto_retry_on_auth_error(default=[])
+    def get_devices(self, page_index: int = 0, page_size: int = 50) -> List[Dict[str, Any]]:
         """获取设备列表"""
-        # 清理装饰器传递的内部参数
-        kwargs.pop('_is_retry', None)
-        
-        if not self.authkey:
-            logger.info("未登录，尝试登录...")
-            if not self.login():
-                logger.error("登录失败，无法获取设备列表")
-                return []
+        payload = self._tmpl_list.copy()
+        payload["authkey"] = self.authkey
+        payload["pageIndex"] = page_index
+        payload["pageSize"] = page_size
+        logger.info("请求获取设备列表: userID=%s, page=%s, size=%s", self.user_id, page_index, page_size)
+        try:
+            data = self._post(payload)
+        except FeederAPIError as e:
+            logger.error(f"❌ 获取设备列表请求失败: {e}")
+            return []
         
-        payload = {
-            "msgType": 1401,
-            "authkey": self.authkey,
-            "userID": self.user_id,
-            "pageIndex": page_index,
-            "pageSize": page_size,
-        }
-        logger.info(f"请求获取设备列表: userID={self.user_id}, page={page_index}, size={page_size}")
-        result = self._post(payload)
+        status = data.get("status")
+        self._last_api_status = status  # 记录 status
         
-        if result.get("success"):
-            data = result.get("data", {})
-            status = data.get("status")
-            self._last_api_status = status  # 记录 status
-            
-            if status == 1:
-                devices = data.get("data", [])
-                if isinstance(devices, list):
-                    logger.info(f"✅ 获取设备列表成功: 共 {len(devices)} 个设备")
-                    return devices
-                else:
-                    logger.warning("设备列表格式不正确")
-                    return []
+        if status == 1:
+            devices = data.get("data", [])
+            if isinstance(devices, list):
+                logger.info("✅ 获取设备列表成功: 共 %d 个设备", len(devices))
+                if page_index == 0:
+                    self._update_device_cache(devices)
+                return devices
             else:
-                error_msg = data.get("msg") or data.get("message") or "未知错误"
-                logger.error(f"❌ 获取设备列表失败: status={status}, 原因: {error_msg}")
+                logger.warning("设备列表格式不正确")
                 return []
         else:
-            error = result.get("error", "未知错误")
-            logger.error(f"❌ 获取设备列表请求失败: {error}")
+            error_msg = data.get("msg") or data.get("message") or "未知错误"
+            logger.error(f"❌ 获取设备列表失败: status={status}, 原因: {error_msg}")
             return []
     
-    @auto_retry_on_auth_error
-    def get_device_status(self, dev_id: str, **kwargs) -> Optional[Dict[str, Any]]:
+    @auto_retry_on_auth_error(default=None)
+    def get_device_status(self, dev_id: str) -> Optional[Dict[str, Any]]:
         """
         获取设备状态
         
@@ -279,50 +343,73 @@ class FeederService:
         Returns:
             dict: 设备状态信息，包含 online, battery, leftover, feedAmount 等
         """
-        # 清理装饰器传递的内部参数
-        kwargs.pop('_is_retry', None)
+        payload = self._tmpl_status.copy()
+        payload["authkey"] = self.authkey
+        payload["devID"] = dev_id
+        logger.info("请求获取设备状态: devID=%s", dev_id)
+        try:
+            data = self._post(payload)
+        except FeederAPIError as e:
+            logger.error(f"❌ 获取设备状态请求失败: {e}")
+            return None
         
-        if not self.authkey:
-            logger.info("未登录，尝试登录...")
-            if not self.login():
-                logger.error("登录失败，无法获取设备状态")
-                return None
+        status = data.get("status")
+        self._last_api_status = status  # 记录 status
         
-        payload = {
-            "msgType": 1402,  # 获取设备状态的消息类型
-            "authkey": self.authkey,
-            "userID": self.user_id,
-            "devID": dev_id,
-            "groupID": "",  # 必需参数，空字符串表示查询所有分组
-            "pageIndex": 0,  # 分页参数
-            "pageSize": 50,  # 分页大小
-        }
-        logger.info(f"请求获取设备状态: devID={dev_id}")
-        result = self._post(payload)
-        
-        if result.get("success"):
-            data = result.get("data", {})
-            status = data.get("status")
-            self._last_api_status = status  # 记录 status
-            
-            if status == 1:
-                device_data = data.get("data", [])
-                if device_data and isinstance(device_data, list) and len(device_data) > 0:
-                    status_info = device_data[0]
-                    logger.info(f"✅ 获取设备状态成功: {status_info}")
-                    return status_info
-                else:
-                    logger.warning("设备状态数据为空")
-                    return None
+        if status == 1:
+            device_data = data.get("data", [])
+            if device_data and isinstance(device_data, list) and len(device_data) > 0:
+                status_info = device_data[0]
+                logger.info("✅ 获取设备状态成功: %s", status_info)
+                return status_info
             else:
-                error_msg = data.get("msg") or data.get("message") or "未知错误"
-                logger.error(f"❌ 获取设备状态失败: status={status}, 原因: {error_msg}")
+                logger.warning("设备状态数据为空")
                 return None
         else:
-            error = result.get("error", "未知错误")
-            logger.error(f"❌ 获取设备状态请求失败: {error}")
+            error_msg = data.get("msg") or data.get("message") or "未知错误"
+            logger.error(f"❌ 获取设备状态失败: status={status}, 原因: {error_msg}")
             return None
     
+    def _update_device_cache(self, devices: List[Dict[str, Any]]):
+        """根据最新设备列表重建 ID / 名称索引"""
+        by_id = {}
+        by_name = {}
+        names_lower = []
+        for device in devices:
+            name_lower = device.get('devName', '').lower()
+            by_id.setdefault(device.get('devID'), device)
+            by_name.setdefault(name_lower, device)
+            names_lower.append((name_lower, device))
+        self._by_id = by_id
+        self._by_name = by_name
+        self._names_lower = names_lower
+        self._device_cache_ts = time.monotonic()
+    
+    def _device_cache_fresh(self) -> bool:
+        """设备索引是否仍在有效期内"""
+        return time.monotonic() - self._device_cache_ts < DEVICE_CACHE_TTL
+    
+    def get_device_by_id(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按设备ID精确查找设备（索引在有效期内时不请求云端）
+        
+        Args:
+            device_id: 设备ID
+        
+        Returns:
+            设备信息，找不到返回 None
+        """
+        self.ensure_device_cache()
+        return self._by_id.get(device_id)
+    
+    def ensure_device_cache(self):
+        """设备索引过期时从云端刷新，有效期内直接返回"""
+        if not self._device_cache_fresh():
+            # 双重检查：并发调用只有一个线程去云端刷新，其余等待后直接读新索引
+            with self._device_refresh_lock:
+                if not self._device_cache_fresh():
+                    self.get_devices()
+    
     def find_device_by_name(self, device_name: str) -> Optional[Dict[str, Any]]:
         """
         根据设备名称查找设备
@@ -333,16 +420,22 @@ class FeederService:
         Returns:
             匹配的设备信息，如果找不到返回 None
         """
+        device_name_lower = device_name.lower().strip()
+        
+        # 缓存命中：无需请求云端
+        if device_name_lower in self._by_name and self._device_cache_fresh():
+            return self._by_name[device_name_lower]
+        
         devices = self.get_devices()
         if not devices:
             logger.warning("设备列表为空")
             return None
         
-        device_name_lower = device_name.lower().strip()
-        for device in devices:
-            if device.get('devName', '').lower() == device_name_lower:
-                logger.info(f"✅ 找到设备: {device}")
-                return device
+        # get_devices 成功后索引已刷新，名称小写只在建索引时计算一次
+        device = self._by_name.get(device_name_lower)
+        if device is not None:
+            logger.info("✅ 找到设备: %s", device)
+            return device
         
         logger.warning(f"⚠️ 未找到设备: {device_name}")
         return None
@@ -357,6 +450,10 @@ class FeederService:
         Returns:
             匹配的设备信息，包含 devID 和 devName；找不到返回 None
         """
+        # 缓存命中：传入的已是有效设备ID，无需请求云端
+        if query in self._by_id and self._device_cache_fresh():
+            return self._by_id[query]
+        
         devices = self.get_devices()
         if not devices:
             logger.warning("设备列表为空")
@@ -365,22 +462,22 @@ class FeederService:
         query_lower = query.lower().strip()
         
         # 精确匹配设备ID
-        for device in devices:
-            if device.get('devID') == query:
-                logger.info(f"✅ 精确匹配设备ID: {device}")
-                return device
+        device = self._by_id.get(query)
+        if device is not None:
+            logger.info("✅ 精确匹配设备ID: %s", device)
+            return device
         
         # 精确匹配设备名称
-        for device in devices:
-            if device.get('devName', '').lower() == query_lower:
-                logger.info(f"✅ 精确匹配设备名称: {device}")
-                return device
-        
-        # 模糊匹配设备名称
-        for device in devices:
-            if query_lower in device.get('devName', '').lower():
-                logger.info(f"✅ 模糊匹配设备名称: {device}")
-                return device
+        device = self._by_name.get(query_lower)
+        if device is not None:
+            logger.info("✅ 精确匹配设备名称: %s", device)
+            return device
+        
+        # 模糊匹配设备名称（查询串是设备名的子串）
+        device = next((dev for name_lower, dev in self._names_lower if query_lower in name_lower), None)
+        if device is not None:
+            logger.info("✅ 模糊匹配设备名称: %s", device)
+            return device
         
         logger.warning(f"⚠️ 未找到匹配的设备: {query}")
         return None
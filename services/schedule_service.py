@@ -2,35 +2,71 @@
 定时任务管理服务
 负责任务的CRUD操作、数据库持久化、与调度器交互
 """
-import json
+import io
 import uuid
 import logging
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, Any, List, Optional
+from zoneinfo import ZoneInfo
 
-import pytz
+from sqlalchemy import Integer, cast, func, update, delete, insert, select, literal
 
 from config.settings import settings
 from database.db_session import db_session_factory
-from models.task import Task, TaskTopic, TaskStatus, TaskMode
+from models.task import Task, TaskExecution, TaskTopic, TaskStatus, TaskMode
 from scheduler.task_scheduler import get_task_scheduler, ScheduledTask
+from utils.json_utils import dumps, loads
 
 logger = logging.getLogger(__name__)
 
+# 每个daily任务保留的执行记录条数
+EXECUTION_HISTORY_KEEP = 10
+
+
+# request JSON 中常用字段的数据库端提取表达式
+_REQ_DEVICE_ID = func.json_unquote(func.json_extract(Task.request, "$.device_id"))
+_REQ_FEED_COUNT = cast(func.json_extract(Task.request, "$.feed_count"), Integer)
+_REQ_SCHEDULED_TIME = func.json_unquote(func.json_extract(Task.request, "$.scheduled_time"))
+
+# 任务状态对应的展示图标（只读，模块级共享）
+_STATUS_EMOJI = MappingProxyType({
+    TaskStatus.PENDING: "⏳",
+    TaskStatus.RUNNING: "🔄",
+    TaskStatus.COMPLETED: "✅",
+    TaskStatus.FAILED: "❌",
+    TaskStatus.CANCELLED: "🚫",
+})
+
 
 class ScheduleService:
     """定时任务管理服务"""
     
+    __slots__ = ("tz",)
+    
     def __init__(self):
         """初始化服务"""
-        self.tz = pytz.timezone(settings.TIMEZONE)
+        self.tz = ZoneInfo(settings.TIMEZONE)
         logger.info("定时任务管理服务初始化完成")
     
     def _generate_task_id(self) -> str:
-        """生成任务唯一ID"""
-        return str(uuid.uuid4())
+        """生成任务唯一ID（32位十六进制，不含连字符）"""
+        return uuid.uuid4().hex
+    
+    def _get_task(self, session, task_id: str, db_id: Optional[int] = None) -> Optional[Task]:
+        """按主键（优先，走会话 identity map）或 task_id 查询任务"""
+        if db_id is not None:
+            return session.get(Task, db_id)
+        return session.query(Task).filter(Task.task_id == task_id).first()
     
-    def _execute_feed_task(self, device_id: str, feed_count: int, task_id: str, mode: str = TaskMode.ONCE) -> bool:
+    def _execute_feed_task(
+        self,
+        device_id: str,
+        feed_count: int,
+        task_id: str,
+        mode: str = TaskMode.ONCE,
+        db_id: Optional[int] = None
+    ) -> bool:
         """
         执行喂食任务
         
@@ -39,6 +75,7 @@ class ScheduleService:
             feed_count: 喂食份数
             task_id: 任务ID
             mode: 任务模式（once/daily）
+            db_id: 数据库记录ID（调度任务已持有，可直接按主键更新）
             
         Returns:
             是否执行成功
@@ -47,10 +84,11 @@ class ScheduleService:
             from services.feeder_service import get_feeder_service
             feeder_service = get_feeder_service()
             
-            logger.info(f"🍽️ 执行定时喂食: task_id={task_id}, device_id={device_id}, feed_count={feed_count}, mode={mode}")
+            logger.info("🍽️ 执行定时喂食: task_id=%s, device_id=%s, feed_count=%s, mode=%s", task_id, device_id, feed_count, mode)
             
             # 执行喂食（会自动上传记录）
             result = feeder_service.feed(device_id, feed_count)
+            now = datetime.now(self.tz)
             
             # 根据模式决定状态更新
             if mode == TaskMode.DAILY:
@@ -59,25 +97,30 @@ class ScheduleService:
                     task_id=task_id,
                     success=result,
                     device_id=device_id,
-                    feed_count=feed_count
+                    feed_count=feed_count,
+                    executed_at=now,
+                    db_id=db_id
                 )
             else:
                 # once任务：执行后更新为completed或failed
                 self._update_task_status(
                     task_id=task_id,
                     status=TaskStatus.COMPLETED if result else TaskStatus.FAILED,
-                    response=json.dumps({
+                    response=dumps({
                         "success": result,
                         "device_id": device_id,
                         "feed_count": feed_count,
-                        "executed_at": datetime.now(self.tz).isoformat()
-                    })
+                        "executed_at": now.isoformat()
+                    }),
+                    now=now,
+                    db_id=db_id
                 )
             
             return result
             
         except Exception as e:
-            logger.error(f"执行喂食任务失败: {e}", exc_info=True)
+            logger.error("执行喂食任务失败: %s", e, exc_info=True)
+            now = datetime.now(self.tz)
             
             # 更新数据库任务状态为失败（once任务才标记failed，daily任务只记录错误）
             if mode == TaskMode.DAILY:
@@ -86,70 +129,119 @@ class ScheduleService:
                     success=False,
                     device_id=device_id,
                     feed_count=feed_count,
-                    error=str(e)
+                    error=str(e),
+                    executed_at=now,
+                    db_id=db_id
                 )
             else:
                 self._update_task_status(
                     task_id=task_id,
                     status=TaskStatus.FAILED,
-                    response=json.dumps({
+                    response=dumps({
                         "success": False,
                         "error": str(e),
-                        "executed_at": datetime.now(self.tz).isoformat()
-                    })
+                        "executed_at": now.isoformat()
+                    }),
+                    now=now,
+                    db_id=db_id
                 )
             
             return False
     
-    def _update_task_execution_record(self, task_id: str, success: bool, device_id: str, feed_count: int, error: str = None):
-        """更新daily任务的执行记录（不改变状态）"""
+    def _update_task_execution_record(
+        self,
+        task_id: str,
+        success: bool,
+        device_id: str,
+        feed_count: int,
+        error: str = None,
+        executed_at: Optional[datetime] = None,
+        db_id: Optional[int] = None
+    ):
+        """追加daily任务的执行记录（不改变状态）"""
+        executed_at = executed_at or datetime.now(self.tz)
         try:
             with db_session_factory() as session:
-                task = session.query(Task).filter(Task.task_id == task_id).first()
-                if task:
-                    # 读取现有的response，追加新的执行记录
-                    existing_response = json.loads(task.response) if task.response else {"executions": []}
-                    if "executions" not in existing_response:
-                        existing_response = {"executions": []}
-                    
-                    # 添加本次执行记录
-                    execution_record = {
-                        "success": success,
-                        "device_id": device_id,
-                        "feed_count": feed_count,
-                        "executed_at": datetime.now(self.tz).isoformat()
-                    }
-                    if error:
-                        execution_record["error"] = error
-                    
-                    existing_response["executions"].append(execution_record)
-                    
-                    # 只保留最近10次执行记录
-                    if len(existing_response["executions"]) > 10:
-                        existing_response["executions"] = existing_response["executions"][-10:]
-                    
-                    task.response = json.dumps(existing_response, ensure_ascii=False)
-                    # 状态保持pending，不更新completed_at
-                    session.commit()
-                    logger.info(f"✅ daily任务执行记录已更新: {task_id}, success={success}")
+                # 执行记录写入独立表，只追加不回读；历史裁剪见 prune_execution_history
+                values = {
+                    "device_id": device_id,
+                    "feed_count": feed_count,
+                    "success": success,
+                    "executed_at": executed_at,
+                    "error": error,
+                }
+                if db_id is not None:
+                    stmt = insert(TaskExecution).values(task_id=db_id, **values)
+                else:
+                    # 只有 task_id 时用 INSERT ... SELECT，一条语句完成主键查找与写入
+                    stmt = insert(TaskExecution).from_select(
+                        ["task_id", *values],
+                        select(Task.id, *(literal(v) for v in values.values()))
+                        .where(Task.task_id == task_id)
+                    )
+                result = session.execute(stmt)
+                # 状态保持pending，不更新completed_at
+                session.commit()
+                if result.rowcount:
+                    logger.info("✅ daily任务执行记录已更新: %s, success=%s", task_id, success)
         except Exception as e:
-            logger.error(f"更新daily任务执行记录失败: {e}", exc_info=True)
+            logger.error("更新daily任务执行记录失败: %s", e, exc_info=True)
     
-    def _update_task_status(self, task_id: str, status: str, response: Optional[str] = None):
+    def prune_execution_history(self, keep: int = EXECUTION_HISTORY_KEEP) -> int:
+        """
+        裁剪执行记录，每个任务只保留最近 keep 条
+        
+        Args:
+            keep: 每个任务保留的记录数
+            
+        Returns:
+            删除的记录数
+        """
+        try:
+            with db_session_factory() as session:
+                ranked = select(
+                    TaskExecution.id,
+                    func.row_number().over(
+                        partition_by=TaskExecution.task_id,
+                        order_by=TaskExecution.executed_at.desc()
+                    ).label("rn")
+                ).subquery()
+                # 再包一层派生表，MySQL 不允许在 DELETE 的子查询中直接引用目标表
+                stale_ids = select(ranked.c.id).where(ranked.c.rn > keep).subquery()
+                result = session.execute(
+                    delete(TaskExecution)
+                    .where(TaskExecution.id.in_(select(stale_ids.c.id)))
+                    .execution_options(synchronize_session=False)
+                )
+                session.commit()
+                logger.info("🧹 已裁剪执行记录: %s 条", result.rowcount)
+                return result.rowcount
+        except Exception as e:
+            logger.error("裁剪执行记录失败: %s", e, exc_info=True)
+            return 0
+    
+    def _update_task_status(
+        self,
+        task_id: str,
+        status: str,
+        response: Optional[str] = None,
+        now: Optional[datetime] = None,
+        db_id: Optional[int] = None
+    ):
         """更新数据库中的任务状态"""
         try:
             with db_session_factory() as session:
-                task = session.query(Task).filter(Task.task_id == task_id).first()
+                task = self._get_task(session, task_id, db_id)
                 if task:
                     task.status = status
                     if response:
                         task.response = response
                     if status == TaskStatus.COMPLETED:
-                        task.completed_at = datetime.now(self.tz)
+                        task.completed_at = now or datetime.now(self.tz)
                     session.commit()
-                    logger.info(f"✅ 任务状态已更新: {task_id} -> {status}")
+                    logger.info("✅ 任务状态已更新: %s -> %s", task_id, status)
         except Exception as e:
-            logger.error(f"更新任务状态失败: {e}", exc_info=True)
+            logger.error("更新任务状态失败: %s", e, exc_info=True)
     
     def create_task(
         self,
@@ -175,7 +267,7 @@ class ScheduleService:
             
             # 确保时间带有日本时区
             if scheduled_time.tzinfo is None:
-                scheduled_time = self.tz.localize(scheduled_time)
+                scheduled_time = scheduled_time.replace(tzinfo=self.tz)
             else:
                 scheduled_time = scheduled_time.astimezone(self.tz)
             
@@ -201,13 +293,15 @@ class ScheduleService:
                     topic=TaskTopic.SCHEDULE_FEED,
                     tool_name="feed_device",
                     mode=mode,
-                    request=json.dumps(request_data, ensure_ascii=False),
+                    request=dumps(request_data),
                     status=TaskStatus.PENDING
                 )
                 session.add(task)
+                # created_at/updated_at 由数据库 server_default 填充；提交后直接取自增主键，
+                # 会话关闭了 expire_on_commit，不回读时间戳字段
                 session.commit()
                 db_id = task.id
-                logger.info(f"✅ 任务已保存到数据库: task_id={task_id}, db_id={db_id}")
+            logger.info("✅ 任务已保存到数据库: task_id=%s, db_id=%s", task_id, db_id)
             
             # 添加到调度器
             scheduler = get_task_scheduler()
@@ -233,7 +327,7 @@ class ScheduleService:
             }
             
         except Exception as e:
-            logger.error(f"创建定时任务失败: {e}", exc_info=True)
+            logger.error("创建定时任务失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "message": f"❌ 创建定时任务失败: {str(e)}"
@@ -261,8 +355,34 @@ class ScheduleService:
             更新结果
         """
         try:
+            if scheduled_time is not None:
+                if scheduled_time.tzinfo is None:
+                    scheduled_time = scheduled_time.replace(tzinfo=self.tz)
+                else:
+                    scheduled_time = scheduled_time.astimezone(self.tz)
+            
+            # 仅修改执行时间：一条 UPDATE 直接改写 JSON 字段，无需先 SELECT
+            if scheduled_time is not None and device_id is None and feed_count is None and mode is None:
+                with db_session_factory() as session:
+                    result = session.execute(
+                        update(Task)
+                        .where(Task.task_id == task_id, Task.status == TaskStatus.PENDING)
+                        .values(request=func.json_set(Task.request, "$.scheduled_time", scheduled_time.isoformat()))
+                        .execution_options(synchronize_session=False)
+                    )
+                    session.commit()
+                if result.rowcount:
+                    get_task_scheduler().reschedule(task_id, scheduled_time)
+                    logger.info("✅ 任务已更新: %s", task_id)
+                    return {
+                        "success": True,
+                        "task_id": task_id,
+                        "message": f"✅ 定时任务更新成功！\n任务ID: {task_id}"
+                    }
+                # 未更新到任何行：任务不存在或状态不对，走下面的完整路径给出具体原因
+            
             with db_session_factory() as session:
-                task = session.query(Task).filter(Task.task_id == task_id).first()
+                task = self._get_task(session, task_id)
                 
                 if not task:
                     return {
@@ -277,7 +397,7 @@ class ScheduleService:
                     }
                 
                 # 解析当前请求参数
-                request_data = json.loads(task.request)
+                request_data = loads(task.request)
                 
                 # 更新参数
                 if device_id is not None:
@@ -285,15 +405,11 @@ class ScheduleService:
                 if feed_count is not None:
                     request_data["feed_count"] = feed_count
                 if scheduled_time is not None:
-                    if scheduled_time.tzinfo is None:
-                        scheduled_time = self.tz.localize(scheduled_time)
-                    else:
-                        scheduled_time = scheduled_time.astimezone(self.tz)
                     request_data["scheduled_time"] = scheduled_time.isoformat()
                 if mode is not None:
                     task.mode = mode
                 
-                task.request = json.dumps(request_data, ensure_ascii=False)
+                task.request = dumps(request_data)
                 session.commit()
                 
                 # 更新调度器中的任务
@@ -310,7 +426,7 @@ class ScheduleService:
                 
                 scheduler.update_task(task_id, **update_kwargs)
                 
-                logger.info(f"✅ 任务已更新: {task_id}")
+                logger.info("✅ 任务已更新: %s", task_id)
                 
                 return {
                     "success": True,
@@ -319,7 +435,7 @@ class ScheduleService:
                 }
                 
         except Exception as e:
-            logger.error(f"更新定时任务失败: {e}", exc_info=True)
+            logger.error("更新定时任务失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "message": f"❌ 更新定时任务失败: {str(e)}"
@@ -337,7 +453,7 @@ class ScheduleService:
         """
         try:
             with db_session_factory() as session:
-                task = session.query(Task).filter(Task.task_id == task_id).first()
+                task = self._get_task(session, task_id)
                 
                 if not task:
                     return {
@@ -353,7 +469,7 @@ class ScheduleService:
                 scheduler = get_task_scheduler()
                 scheduler.remove_task(task_id)
                 
-                logger.info(f"✅ 任务已删除: {task_id}")
+                logger.info("✅ 任务已删除: %s", task_id)
                 
                 return {
                     "success": True,
@@ -362,7 +478,7 @@ class ScheduleService:
                 }
                 
         except Exception as e:
-            logger.error(f"删除定时任务失败: {e}", exc_info=True)
+            logger.error("删除定时任务失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "message": f"❌ 删除定时任务失败: {str(e)}"
@@ -380,7 +496,7 @@ class ScheduleService:
         """
         try:
             with db_session_factory() as session:
-                task = session.query(Task).filter(Task.task_id == task_id).first()
+                task = self._get_task(session, task_id)
                 
                 if not task:
                     return {
@@ -388,7 +504,7 @@ class ScheduleService:
                         "message": f"❌ 任务不存在: {task_id}"
                     }
                 
-                request_data = json.loads(task.request)
+                request_data = loads(task.request)
                 
                 return {
                     "success": True,
@@ -406,7 +522,7 @@ class ScheduleService:
                 }
                 
         except Exception as e:
-            logger.error(f"获取任务详情失败: {e}", exc_info=True)
+            logger.error("获取任务详情失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "message": f"❌ 获取任务详情失败: {str(e)}"
@@ -431,60 +547,59 @@ class ScheduleService:
         """
         try:
             with db_session_factory() as session:
-                query = session.query(Task).filter(
-                    Task.topic == TaskTopic.SCHEDULE_FEED
-                )
+                # 只投影需要的列（request JSON 字段在数据库端提取），返回轻量 Row 而非 ORM 实例
+                stmt = select(
+                    Task.task_id,
+                    _REQ_DEVICE_ID.label("device_id"),
+                    _REQ_FEED_COUNT.label("feed_count"),
+                    _REQ_SCHEDULED_TIME.label("scheduled_time"),
+                    Task.mode,
+                    Task.status,
+                    Task.created_at,
+                ).where(Task.topic == TaskTopic.SCHEDULE_FEED)
                 
                 if status:
-                    query = query.filter(Task.status == status)
+                    stmt = stmt.where(Task.status == status)
+                
+                # device_id 存在 request JSON 中，在数据库端过滤，保证 limit 作用于筛选后的结果
+                if device_id:
+                    stmt = stmt.where(_REQ_DEVICE_ID == device_id)
                 
-                tasks = query.order_by(Task.created_at.desc()).limit(limit).all()
+                rows = session.execute(
+                    stmt.order_by(Task.created_at.desc()).limit(limit)
+                ).mappings()
                 
                 task_list = []
-                for task in tasks:
-                    request_data = json.loads(task.request)
-                    
-                    # 如果指定了device_id筛选
-                    if device_id and request_data.get("device_id") != device_id:
-                        continue
-                    
+                for row in rows:
+                    created_at = row["created_at"]
                     task_list.append({
-                        "task_id": task.task_id,
-                        "device_id": request_data.get("device_id"),
-                        "feed_count": request_data.get("feed_count"),
-                        "scheduled_time": request_data.get("scheduled_time"),
-                        "mode": task.mode,
-                        "status": task.status,
-                        "created_at": task.created_at.isoformat() if task.created_at else None
+                        "task_id": row["task_id"],
+                        "device_id": row["device_id"],
+                        "feed_count": row["feed_count"],
+                        "scheduled_time": row["scheduled_time"],
+                        "mode": row["mode"],
+                        "status": row["status"],
+                        "created_at": created_at.isoformat() if created_at else None
                     })
                 
                 # 构建消息
                 if task_list:
-                    msg_lines = [f"📋 定时喂食任务列表（共{len(task_list)}个）:\n"]
+                    buf = io.StringIO()
+                    buf.write(f"📋 定时喂食任务列表（共{len(task_list)}个）:\n")
                     for i, t in enumerate(task_list, 1):
-                        status_emoji = {
-                            "pending": "⏳",
-                            "running": "🔄",
-                            "completed": "✅",
-                            "failed": "❌",
-                            "cancelled": "🚫"
-                        }.get(t["status"], "❓")
+                        status_emoji = _STATUS_EMOJI.get(t["status"], "❓")
                         
-                        # 解析时间
-                        try:
-                            dt = datetime.fromisoformat(t["scheduled_time"])
-                            time_str = dt.strftime("%Y-%m-%d %H:%M")
-                        except:
-                            time_str = t["scheduled_time"]
+                        # scheduled_time 以 ISO 格式存储，直接截取 "YYYY-MM-DDTHH:MM" 部分
+                        time_str = (t["scheduled_time"] or "")[:16].replace("T", " ")
                         
-                        msg_lines.append(
-                            f"{i}. {status_emoji} 设备: {t['device_id']}, "
+                        buf.write(
+                            f"\n{i}. {status_emoji} 设备: {t['device_id']}, "
                             f"份数: {t['feed_count']}, "
                             f"时间: {time_str}, "
                             f"模式: {t['mode']}"
+                            f"\n   ID: {t['task_id'][:8]}..."
                         )
-                        msg_lines.append(f"   ID: {t['task_id'][:8]}...")
-                    message = "\n".join(msg_lines)
+                    message = buf.getvalue()
                 else:
                     message = "📋 暂无定时喂食任务"
                 
@@ -496,7 +611,7 @@ class ScheduleService:
                 }
                 
         except Exception as e:
-            logger.error(f"获取任务列表失败: {e}", exc_info=True)
+            logger.error("获取任务列表失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "tasks": [],
@@ -512,61 +627,77 @@ class ScheduleService:
         """
         try:
             with db_session_factory() as session:
-                tasks = session.query(Task).filter(
-                    Task.status == TaskStatus.PENDING,
-                    Task.topic == TaskTopic.SCHEDULE_FEED
+                # 在数据库端提取 request JSON 中的字段，避免逐行加载ORM对象并解析JSON
+                rows = session.execute(
+                    select(
+                        Task.id,
+                        Task.task_id,
+                        Task.mode,
+                        _REQ_DEVICE_ID.label("device_id"),
+                        _REQ_FEED_COUNT.label("feed_count"),
+                        _REQ_SCHEDULED_TIME.label("scheduled_time"),
+                    ).where(
+                        Task.status == TaskStatus.PENDING,
+                        Task.topic == TaskTopic.SCHEDULE_FEED
+                    )
                 ).all()
                 
                 scheduler = get_task_scheduler()
-                loaded_count = 0
+                scheduled_tasks = []
+                stale_rows = []
+                now = datetime.now(self.tz)
                 
-                for task in tasks:
+                for row in rows:
                     try:
-                        request_data = json.loads(task.request)
-                        
                         # 解析计划执行时间
-                        scheduled_time = datetime.fromisoformat(request_data["scheduled_time"])
+                        scheduled_time = datetime.fromisoformat(row.scheduled_time)
                         if scheduled_time.tzinfo is None:
-                            scheduled_time = self.tz.localize(scheduled_time)
-                        
-                        now = datetime.now(self.tz)
+                            scheduled_time = scheduled_time.replace(tzinfo=self.tz)
                         
-                        # once任务时间已过，标记为失败
-                        if task.mode == TaskMode.ONCE and scheduled_time <= now:
-                            task.status = TaskStatus.FAILED
-                            task.response = json.dumps({
-                                "error": "任务时间已过",
-                                "scheduled_time": scheduled_time.isoformat(),
-                                "checked_at": now.isoformat()
+                        # once任务时间已过，收集后统一标记为失败
+                        if row.mode == TaskMode.ONCE and scheduled_time <= now:
+                            stale_rows.append({
+                                "id": row.id,
+                                "status": TaskStatus.FAILED,
+                                "response": dumps({
+                                    "error": "任务时间已过",
+                                    "scheduled_time": scheduled_time.isoformat(),
+                                    "checked_at": now.isoformat()
+                                })
                             })
-                            session.commit()
-                            logger.warning(f"⏰ 一次性任务时间已过，标记为失败: {task.task_id}")
+                            logger.warning("⏰ 一次性任务时间已过，标记为失败: %s", row.task_id)
                             continue
                         
                         # 创建调度任务（ScheduledTask会自动计算正确的next_run）
                         # daily任务如果今天时间已过会自动设为明天
-                        scheduled_task = ScheduledTask(
-                            task_id=task.task_id,
-                            device_id=request_data["device_id"],
-                            feed_count=request_data["feed_count"],
+                        scheduled_tasks.append(ScheduledTask(
+                            task_id=row.task_id,
+                            device_id=row.device_id,
+                            feed_count=row.feed_count,
                             scheduled_time=scheduled_time,
-                            mode=task.mode,
+                            mode=row.mode,
                             execute_func=self._execute_feed_task,
-                            db_id=task.id
-                        )
-                        
-                        scheduler.add_task(scheduled_task)
-                        loaded_count += 1
-                        logger.info(f"📅 任务已加载: {task.task_id}, next_run={scheduled_task.next_run}")
+                            db_id=row.id
+                        ))
                         
                     except Exception as e:
-                        logger.error(f"加载任务失败: {task.task_id}, 错误: {e}")
+                        logger.error("加载任务失败: %s, 错误: %s", row.task_id, e)
+                
+                # 过期任务按主键批量更新，一次提交
+                if stale_rows:
+                    session.execute(update(Task), stale_rows)
+                    session.commit()
+                
+                # 批量加入调度器（只获取一次调度器锁）
+                loaded_count = scheduler.add_tasks_bulk(scheduled_tasks)
+                for scheduled_task in scheduled_tasks:
+                    logger.info("📅 任务已加载: %s, next_run=%s", scheduled_task.task_id, scheduled_task.next_run)
                 
-                logger.info(f"📋 从数据库加载了 {loaded_count} 个待执行的定时投喂任务")
+                logger.info("📋 从数据库加载了 %s 个待执行的定时投喂任务", loaded_count)
                 return loaded_count
                 
         except Exception as e:
-            logger.error(f"加载待执行任务失败: {e}", exc_info=True)
+            logger.error("加载待执行任务失败: %s", e, exc_info=True)
             return 0
 
 
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 class SensorService:
     """传感器服务 - 连接管理器"""
     
+    __slots__ = ("base_url", "api_key", "timeout", "_client")
+    
     def __init__(self):
         """初始化配置"""
         self.base_url = settings.SENSOR_API_URL
@@ -27,9 +29,21 @@ class SensorService:
         供Tool层使用
         """
         if self._client is None or self._client.is_closed:
+            # 显式连接池 + HTTP/2：突发的并发工具调用复用同一连接多路复用，
+            # 避免超出默认 keepalive 数后反复握手（自定义 transport 时 limits/http2 需设在 transport 上）
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=1,
+                limits=httpx.Limits(
+                    max_keepalive_connections=50,
+                    max_connections=200,
+                    keepalive_expiry=60,
+                ),
+            )
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
                 timeout=self.timeout,
+                transport=transport,
                 headers={
                     "Authorization": f"Bearer {self.api_key}" if self.api_key else "",
                     "Content-Type": "application/json"
@@ -3,10 +3,48 @@
 """
 测试流式和非流式API
 """
-import requests
+import asyncio
 import json
+import sys
 import time
-from typing import Iterator
+import traceback
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# 优先使用 orjson（C实现，直接解析bytes），未安装时回退到标准库 json
+try:
+    import orjson
+    
+    _loads = orjson.loads
+    
+    def _bounded_dump(obj: Any, n: int) -> str:
+        """序列化为JSON并截取前 n 个字符作为预览（与标准库回退路径一致按字符截取）"""
+        raw = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        # UTF-8 每个字符最多4字节：只解码足够截取 n 个字符的前缀，截断处不完整的尾字符忽略
+        text = raw[:4 * n + 4].decode("utf-8", errors="ignore")
+        return _preview(text, n)
+except ImportError:
+    _loads = json.loads
+    
+    def _bounded_dump(obj: Any, n: int) -> str:
+        """序列化为JSON并截取前 n 个字符作为预览"""
+        return _preview(json.dumps(obj, ensure_ascii=False), n)
+
+# 优先使用 uvloop（libuv实现）驱动流式客户端的事件循环，未安装时使用标准库 asyncio
+try:
+    import uvloop
+    
+    _run_async = uvloop.run
+except ImportError:
+    _run_async = asyncio.run
+
+# 共享会话：复用 urllib3 连接池（keep-alive），避免每次请求重新建立TCP连接
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
 
 def test_non_stream():
@@ -27,7 +65,7 @@ def test_non_stream():
     
     start_time = time.time()
     
-    response = requests.post(url, json=payload, timeout=60)
+    response = SESSION.post(url, json=payload, timeout=60)
     
     end_time = time.time()
     
@@ -46,8 +84,293 @@ def test_non_stream():
         print(response.text)
 
 
-def test_stream():
-    """测试流式API（完整版 - 包含所有事件类型）"""
+def _preview(s: str, n: int) -> str:
+    """截取前 n 个字符作为预览，超长时追加省略号"""
+    return s if len(s) <= n else f"{s[:n]}…"
+
+
+# 各事件类型输出的固定部分（模块级常量，处理事件时只拼接变化的字段）
+_INDENT = "\n              "
+_RULE = "=" * 60
+TAG_START = " 🚀 START: "
+TAG_NODE = " 📋 NODE: "
+TAG_STATUS = " ℹ️  STATUS: "
+TAG_EXPERT_START = " 🧑‍🏫 EXPERT START"
+TAG_EXPERT_STREAM = " 📡 EXPERT STREAM: "
+TAG_EXPERT_DONE = " ✅ EXPERT DONE"
+TAG_EXPERT_ERROR = " ❌ EXPERT ERROR: "
+TAG_ROUTING = " 🔀 ROUTING: "
+TAG_DEVICES_FOUND = " 🔍 DEVICES FOUND: "
+TAG_AGENT_START = " 🤖 AGENT START: "
+TAG_TOOL_CALL = " 🔧 TOOL CALL: "
+TAG_TOOL_RESULT = " 📤 TOOL RESULT: "
+TAG_MESSAGE = " 💬 MESSAGE from "
+TAG_DONE = " ✅ DONE"
+TAG_ERROR = " ❌ ERROR: "
+TAG_UNKNOWN = " ❓ "
+
+
+def _on_start(event: dict, timestamp: str):
+    print(timestamp, TAG_START, _preview(event.get('query', ''), 50), sep='')
+
+
+def _on_node(event: dict, timestamp: str):
+    print(timestamp, TAG_NODE, event.get('node', 'unknown'), _INDENT, event.get('message', ''), sep='')
+
+
+def _on_status(event: dict, timestamp: str):
+    print(timestamp, TAG_STATUS, event.get('message', ''), sep='')
+
+
+def _on_expert_start(event: dict, timestamp: str):
+    print(timestamp, TAG_EXPERT_START, _INDENT, event.get('message', ''), sep='')
+
+
+def _on_expert_stream(event: dict, timestamp: str):
+    print(timestamp, TAG_EXPERT_STREAM, _preview(event.get('content', ''), 80), sep='')
+
+
+def _on_expert_done(event: dict, timestamp: str):
+    print(timestamp, TAG_EXPERT_DONE, _INDENT, event.get('message', ''), sep='')
+
+
+def _on_expert_error(event: dict, timestamp: str):
+    print(timestamp, TAG_EXPERT_ERROR, event.get('error', ''), sep='')
+
+
+def _on_routing(event: dict, timestamp: str):
+    print(timestamp, TAG_ROUTING, event.get('device_type', ''), " → ", event.get('target_node', ''), sep='')
+
+
+def _on_devices_found(event: dict, timestamp: str):
+    print(timestamp, TAG_DEVICES_FOUND, event.get('count', 0), " 个设备", sep='')
+
+
+def _on_agent_start(event: dict, timestamp: str):
+    print(timestamp, TAG_AGENT_START, event.get('agent', ''), sep='')
+
+
+def _on_tool_call(event: dict, timestamp: str):
+    args = _bounded_dump(event.get('args', {}), 80)
+    print(timestamp, TAG_TOOL_CALL, event.get('tool', 'unknown'), _INDENT, "Args: ", args, sep='')
+
+
+def _on_tool_result(event: dict, timestamp: str):
+    print(timestamp, TAG_TOOL_RESULT, _bounded_dump(event.get('result', {}), 100), sep='')
+
+
+def _on_message(event: dict, timestamp: str):
+    # 显示前150个字符
+    content = _preview(event.get('content', ''), 150)
+    print(timestamp, TAG_MESSAGE, event.get('source', 'unknown'), ":", _INDENT, content, sep='')
+
+
+def _on_done(event: dict, timestamp: str):
+    print(
+        "\n", timestamp, TAG_DONE,
+        _INDENT, "Success: ", event.get('success'),
+        _INDENT, "Device Type: ", event.get('device_type'),
+        sep=''
+    )
+    
+    # 显示完整的最终回复
+    if event.get('result') and event['result'].get('messages'):
+        final_msg = event['result']['messages'][0]
+        content = final_msg.get('content', '')
+        print(f"\n{_RULE}\n📄 最终AI回复:\n{_RULE}\n{content}\n{_RULE}")
+
+
+def _on_error(event: dict, timestamp: str):
+    print(timestamp, TAG_ERROR, event.get('error', ''), sep='')
+
+
+def _on_unknown(event: dict, timestamp: str):
+    # 其他未知事件类型
+    print(timestamp, TAG_UNKNOWN, event.get('type', 'unknown').upper(), ": ", event.get('message', ''), sep='')
+
+
+# 事件类型 -> 输出函数（模块加载时构建一次，按类型 O(1) 分发）
+_EVENT_HANDLERS: Dict[str, Callable[[dict, str], None]] = {
+    'start': _on_start,
+    'node': _on_node,
+    'status': _on_status,
+    'expert_start': _on_expert_start,
+    'expert_stream': _on_expert_stream,
+    'expert_done': _on_expert_done,
+    'expert_error': _on_expert_error,
+    'routing': _on_routing,
+    'devices_found': _on_devices_found,
+    'agent_start': _on_agent_start,
+    'tool_call': _on_tool_call,
+    'tool_result': _on_tool_result,
+    'message': _on_message,
+    'done': _on_done,
+    'error': _on_error,
+}
+
+
+# 流式接口可协商的 NDJSON 格式
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# SSE data 字段前缀
+_DATA_PREFIX = b"data: "
+_DATA_PREFIX_LEN = len(_DATA_PREFIX)
+
+# SSE 缓冲区中已消费数据超过该字节数时才压缩
+_SSE_COMPACT_THRESHOLD = 64 * 1024
+
+
+def _parse_sse_event(buf: bytearray, start: int, end: int) -> Optional[bytes]:
+    """解析 buf[start:end] 范围内的单个SSE事件块，返回 data 字段负载（多行 data 以换行拼接），无 data 时返回 None"""
+    data_parts = []
+    while start < end:
+        eol = buf.find(b"\n", start, end)
+        if eol == -1:
+            eol = end
+        # SSE 格式: "data: {json}"，直接在字节上比较前缀，注释/event/id 行不做任何解码
+        if buf[start:start + _DATA_PREFIX_LEN] == _DATA_PREFIX:
+            data_parts.append(buf[start + _DATA_PREFIX_LEN:eol].rstrip(b"\r"))
+        start = eol + 1
+    if not data_parts:
+        return None
+    return b"\n".join(data_parts)
+
+
+def _aiter_body(response: httpx.Response) -> AsyncIterator[bytes]:
+    """响应体字节流：未压缩时直接读取原始字节，跳过 httpx 的内容解码层，少一次拷贝"""
+    return response.aiter_bytes() if "content-encoding" in response.headers else response.aiter_raw()
+
+
+async def _aiter_ndjson(response: httpx.Response) -> AsyncIterator[bytes]:
+    """增量切分NDJSON事件流（每行一个JSON事件），逐行产出JSON字节，无需任何前缀解析"""
+    buf = bytearray()
+    pos = 0
+    async for chunk in _aiter_body(response):
+        scan = len(buf)
+        buf.extend(chunk)
+        idx = buf.find(b"\n", scan)
+        while idx != -1:
+            if idx > pos:
+                yield bytes(buf[pos:idx])
+            pos = idx + 1
+            idx = buf.find(b"\n", pos)
+        if pos > _SSE_COMPACT_THRESHOLD:
+            del buf[:pos]
+            pos = 0
+    if pos < len(buf):
+        yield bytes(buf[pos:])
+
+
+async def _aiter_sse(response: httpx.Response) -> AsyncIterator[bytes]:
+    """
+    增量解析SSE事件流，逐个产出事件的 data 负载（bytes）
+    
+    每次只在新到达的数据中查找事件分隔符 "\n\n"，不重复扫描已累积的缓冲区；
+    已消费的数据用读游标跳过，超过阈值才整体前移一次，避免每个事件都搬移缓冲区
+    """
+    buf = bytearray()
+    pos = 0
+    async for chunk in _aiter_body(response):
+        # 分隔符可能跨两个 chunk，从旧数据末尾前一个字节开始查找
+        scan = max(pos, len(buf) - 1)
+        buf.extend(chunk)
+        idx = buf.find(b"\n\n", scan)
+        while idx != -1:
+            data = _parse_sse_event(buf, pos, idx)
+            pos = idx + 2
+            if data is not None:
+                yield data
+            idx = buf.find(b"\n\n", pos)
+        if pos > _SSE_COMPACT_THRESHOLD:
+            del buf[:pos]
+            pos = 0
+    # 流结束时处理没有以空行结尾的最后一个事件
+    if pos < len(buf):
+        data = _parse_sse_event(buf, pos, len(buf))
+        if data is not None:
+            yield data
+
+
+async def _stream_worker(
+    client: httpx.AsyncClient,
+    url: str,
+    payload: dict,
+    tag: str = "",
+    ndjson: bool = False
+) -> int:
+    """单个流式客户端：接收并打印所有事件，返回事件数"""
+    start_time = time.time()
+    event_count = 0
+    headers = {"Accept": NDJSON_MEDIA_TYPE} if ndjson else None
+    
+    async with client.stream("POST", url, json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            await response.aread()
+            print(f"{tag}❌ 请求失败: {response.status_code}")
+            print(response.text)
+            return event_count
+        
+        print(f"{tag}✅ 连接成功，开始接收事件:\n")
+        print("-" * 60)
+        
+        # 服务端按 Accept 协商返回 NDJSON 或 SSE，按实际的 Content-Type 选择解析方式
+        if response.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+            events = _aiter_ndjson(response)
+        else:
+            events = _aiter_sse(response)
+        
+        async for data_bytes in events:
+            # 单个事件解析失败只跳过该事件，不中断整个流
+            # （json/orjson 的解析错误均为 ValueError 子类）
+            try:
+                event = _loads(data_bytes)
+            except ValueError:
+                continue
+            # 合法JSON但不是对象（数组、字符串等）的事件同样跳过
+            if not isinstance(event, dict):
+                continue
+            
+            event_type = event.get('type', 'unknown')
+            event_count += 1
+            
+            current_time = time.time() - start_time
+            
+            # 格式化事件输出（并发时带上 worker 标记）
+            timestamp = f"[{tag}{current_time:.2f}s #{event_count:03d}]"
+            
+            _EVENT_HANDLERS.get(event_type, _on_unknown)(event, timestamp)
+            # 一个事件的多行输出合并为一次写出，同时保证事件到达即可见
+            sys.stdout.flush()
+    
+    return event_count
+
+
+async def _run_stream_workers(url: str, payload: dict, workers: int, ndjson: bool = False) -> List[Any]:
+    """并发运行多个流式客户端（共享一个连接池）"""
+    async with httpx.AsyncClient(http2=True, timeout=120) as client:
+        return await asyncio.gather(
+            *[
+                _stream_worker(
+                    client,
+                    url,
+                    {**payload, "session_id": f"test-stream-{i + 1:03d}"},
+                    tag=f"W{i + 1:02d} " if workers > 1 else "",
+                    ndjson=ndjson,
+                )
+                for i in range(workers)
+            ],
+            return_exceptions=True,
+        )
+
+
+def test_stream(workers: int = 1, ndjson: bool = False):
+    """
+    测试流式API（完整版 - 包含所有事件类型）
+    
+    Args:
+        workers: 并发客户端数量，大于1时用于压测流式接口
+        ndjson: 是否请求 NDJSON 格式（每行一个JSON事件），默认使用 SSE
+    """
     print("=" * 60)
     print("【流式API测试 - 完整中间过程展示】")
     print("=" * 60)
@@ -59,128 +382,37 @@ def test_stream():
         "session_id": "test-stream-001"
     }
     
-    print(f"\n📤 发送流式请求: {payload['query']}")
+    # 关闭行缓冲，每个事件的输出在缓冲区中累积后一次写出（逐事件 flush），结束后恢复原设置
+    line_buffering, write_through = sys.stdout.line_buffering, sys.stdout.write_through
+    sys.stdout.reconfigure(line_buffering=False, write_through=False)
+    
+    print(f"\n📤 发送流式请求: {payload['query']}（并发数: {workers}）")
     print("📡 开始接收流式数据...\n")
     
     start_time = time.time()
-    event_count = 0
     
     try:
-        with requests.post(url, json=payload, stream=True, timeout=120) as response:
-            if response.status_code == 200:
-                print("✅ 连接成功，开始接收事件:\n")
-                print("-" * 60)
-                
-                for line in response.iter_lines():
-                    if line:
-                        line = line.decode('utf-8')
-                        
-                        # SSE 格式: "data: {json}"
-                        if line.startswith('data: '):
-                            data_str = line[6:]  # 移除 "data: " 前缀
-                            
-                            try:
-                                event = json.loads(data_str)
-                                event_type = event.get('type', 'unknown')
-                                event_count += 1
-                                
-                                current_time = time.time() - start_time
-                                
-                                # 格式化事件输出
-                                timestamp = f"[{current_time:.2f}s #{event_count:03d}]"
-                                
-                                if event_type == 'start':
-                                    print(f"{timestamp} 🚀 START: {event.get('query', '')[:50]}...")
-                                
-                                elif event_type == 'node':
-                                    print(f"{timestamp} 📋 NODE: {event.get('node', 'unknown')}")
-                                    print(f"              {event.get('message', '')}")
-                                
-                                elif event_type == 'status':
-                                    print(f"{timestamp} ℹ️  STATUS: {event.get('message', '')}")
-                                
-                                elif event_type == 'expert_start':
-                                    print(f"{timestamp} 🧑‍🏫 EXPERT START")
-                                    print(f"              {event.get('message', '')}")
-                                
-                                elif event_type == 'expert_stream':
-                                    content = event.get('content', '')
-                                    preview = content[:80] + "..." if len(content) > 80 else content
-                                    print(f"{timestamp} 📡 EXPERT STREAM: {preview}")
-                                
-                                elif event_type == 'expert_done':
-                                    print(f"{timestamp} ✅ EXPERT DONE")
-                                    print(f"              {event.get('message', '')}")
-                                
-                                elif event_type == 'expert_error':
-                                    print(f"{timestamp} ❌ EXPERT ERROR: {event.get('error', '')}")
-                                
-                                elif event_type == 'routing':
-                                    print(f"{timestamp} 🔀 ROUTING: {event.get('device_type', '')} → {event.get('target_node', '')}")
-                                
-                                elif event_type == 'devices_found':
-                                    print(f"{timestamp} 🔍 DEVICES FOUND: {event.get('count', 0)} 个设备")
-                                
-                                elif event_type == 'agent_start':
-                                    print(f"{timestamp} 🤖 AGENT START: {event.get('agent', '')}")
-                                
-                                elif event_type == 'tool_call':
-                                    tool = event.get('tool', 'unknown')
-                                    args = event.get('args', {})
-                                    print(f"{timestamp} 🔧 TOOL CALL: {tool}")
-                                    print(f"              Args: {json.dumps(args, ensure_ascii=False)[:80]}")
-                                
-                                elif event_type == 'tool_result':
-                                    result = event.get('result', {})
-                                    preview = json.dumps(result, ensure_ascii=False)[:100]
-                                    print(f"{timestamp} 📤 TOOL RESULT: {preview}...")
-                                
-                                elif event_type == 'message':
-                                    content = event.get('content', '')
-                                    source = event.get('source', 'unknown')
-                                    print(f"{timestamp} 💬 MESSAGE from {source}:")
-                                    # 显示前150个字符
-                                    preview = content[:150] + "..." if len(content) > 150 else content
-                                    print(f"              {preview}")
-                                
-                                elif event_type == 'done':
-                                    print(f"\n{timestamp} ✅ DONE")
-                                    print(f"              Success: {event.get('success')}")
-                                    print(f"              Device Type: {event.get('device_type')}")
-                                    
-                                    # 显示完整的最终回复
-                                    if event.get('result') and event['result'].get('messages'):
-                                        final_msg = event['result']['messages'][0]
-                                        content = final_msg.get('content', '')
-                                        print(f"\n{'=' * 60}")
-                                        print("📄 最终AI回复:")
-                                        print("=" * 60)
-                                        print(content)
-                                        print("=" * 60)
-                                
-                                elif event_type == 'error':
-                                    print(f"{timestamp} ❌ ERROR: {event.get('error', '')}")
-                                
-                                else:
-                                    # 其他未知事件类型
-                                    print(f"{timestamp} ❓ {event_type.upper()}: {event.get('message', '')}")
-                            
-                            except json.JSONDecodeError as e:
-                                print(f"⚠️ 无法解析JSON: {data_str[:100]}")
-                                print(f"   错误: {e}")
-                
-                end_time = time.time()
-                print(f"\n⏱️ 总耗时: {end_time - start_time:.2f}秒")
-                print(f"📊 事件总数: {event_count}")
-            
+        results = _run_async(_run_stream_workers(url, payload, workers, ndjson))
+        
+        event_count = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"❌ 流式请求异常: {result}")
+                traceback.print_exception(result)
             else:
-                print(f"❌ 请求失败: {response.status_code}")
-                print(response.text)
+                event_count += result
+        
+        end_time = time.time()
+        print(f"\n⏱️ 总耗时: {end_time - start_time:.2f}秒")
+        print(f"📊 事件总数: {event_count}")
+        sys.stdout.flush()
     
     except Exception as e:
         print(f"❌ 流式请求异常: {e}")
-        import traceback
         traceback.print_exc()
+    
+    finally:
+        sys.stdout.reconfigure(line_buffering=line_buffering, write_through=write_through)
 
 
 def main():
@@ -188,24 +420,27 @@ def main():
     print("设备管理Agent - 流式 vs 非流式 API 对比测试")
     print("🎯" * 30 + "\n")
     
-    # 测试非流式API
-    # test_non_stream()
-    
-    print("\n" + "-" * 60 + "\n")
-    
-    # 等待一下
-    time.sleep(2)
-    
-    # 测试流式API
-    test_stream()
-    
-    print("\n" + "=" * 60)
-    print("✅ 测试完成！")
-    print("=" * 60)
-    print("\n💡 总结:")
-    print("  - 非流式API: 一次性返回所有结果，适合同步场景")
-    print("  - 流式API: 实时推送进度和结果，适合长时间任务和需要实时反馈的场景")
-    print("")
+    try:
+        # 测试非流式API
+        # test_non_stream()
+        
+        print("\n" + "-" * 60 + "\n")
+        
+        # 等待一下
+        time.sleep(2)
+        
+        # 测试流式API
+        test_stream()
+        
+        print("\n" + "=" * 60)
+        print("✅ 测试完成！")
+        print("=" * 60)
+        print("\n💡 总结:")
+        print("  - 非流式API: 一次性返回所有结果，适合同步场景")
+        print("  - 流式API: 实时推送进度和结果，适合长时间任务和需要实时反馈的场景")
+        print("")
+    finally:
+        SESSION.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""ToolRegistry.invoke_many 的调度顺序测试"""
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from tools.tool_provider import ToolRegistry
+
+
+def _make_registry(events: List[Tuple[str, int]]) -> ToolRegistry:
+    """创建注册表并把所有工具替换为只记录开始/结束事件的假工具"""
+    registry = ToolRegistry()
+
+    def fake(name: str):
+        async def _tool(**kwargs):
+            call = kwargs["call"]
+            events.append(("start", call))
+            await asyncio.sleep(0.01)
+            events.append(("end", call))
+            return name
+
+        return _tool
+
+    for name in list(registry._tools):
+        registry._tools[name] = fake(name)
+    return registry
+
+
+def test_explicit_dependencies_run_in_order():
+    events: List[Tuple[str, int]] = []
+    registry = _make_registry(events)
+    calls = [("consult_expert", {"call": 0}), ("consult_expert", {"call": 1})]
+
+    results = asyncio.run(registry.invoke_many(calls, dependencies={1: [0]}))
+
+    assert results == ["consult_expert", "consult_expert"]
+    assert events.index(("end", 0)) < events.index(("start", 1))
+
+
+def test_independent_calls_overlap():
+    events: List[Tuple[str, int]] = []
+    registry = _make_registry(events)
+    calls = [("consult_expert", {"call": 0}), ("consult_expert", {"call": 1})]
+
+    asyncio.run(registry.invoke_many(calls))
+
+    assert events.index(("start", 1)) < events.index(("end", 0))
+
+
+@pytest.mark.parametrize("dependencies", [
+    {0: [0]},   # 依赖自身
+    {0: [1]},   # 依赖排在后面的调用
+    {1: [5]},   # 依赖下标越界
+    {1: [-1]},  # 负数下标
+    {5: [0]},   # 调用下标越界
+])
+def test_invalid_dependencies_are_rejected(dependencies):
+    events: List[Tuple[str, int]] = []
+    registry = _make_registry(events)
+    calls = [("consult_expert", {"call": 0}), ("consult_expert", {"call": 1})]
+
+    with pytest.raises(ValueError):
+        asyncio.run(registry.invoke_many(calls, dependencies=dependencies))
+    assert events == []
+
+
+def test_conflicting_calls_keep_order_while_unrelated_calls_overlap():
+    events: List[Tuple[str, int]] = []
+    registry = _make_registry(events)
+    calls = [
+        ("feed_device", {"call": 0}),          # 写设备状态
+        ("get_device_info", {"call": 1}),      # 读设备状态：须等喂食完成
+        ("list_schedule_tasks", {"call": 2}),  # 只读定时任务：与设备调用无关
+    ]
+
+    assert registry._conflict_dependencies(calls) == [[], [0], []]
+
+    asyncio.run(registry.invoke_many(calls))
+
+    assert events.index(("end", 0)) < events.index(("start", 1))
+    assert events.index(("start", 2)) < events.index(("end", 0))
@@ -5,31 +5,52 @@
 将喂食机服务包装成可供大模型调用的工具函数
 包含：即时喂食、定时喂食任务管理（创建/修改/删除/查询）
 """
+import asyncio
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any, Optional
+from zoneinfo import ZoneInfo
 
-import pytz
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from langchain_core.tools import tool
 
 from config.settings import settings
+from services.feeder_service import get_feeder_service
+from services.schedule_service import get_schedule_service
 
 logger = logging.getLogger(__name__)
 
 # 系统时区
-TZ = pytz.timezone(settings.TIMEZONE)
+TZ = ZoneInfo(settings.TIMEZONE)
+
+
+@lru_cache(maxsize=256)
+def _parse_local_time(value: str) -> datetime:
+    """
+    解析ISO格式时间字符串并统一到系统时区（未带时区时视为系统时区）
+    datetime 不可变，可直接缓存，LLM 重复给出的相同时间串无需重复解析
+    """
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=TZ)
+    return dt.astimezone(TZ)
 
 
 # ==================== Pydantic Schemas ====================
 
-class FeedDeviceInput(BaseModel):
+class _ToolInput(BaseModel):
+    """工具输入参数基类：参数只由 @tool 校验一次，之后只读"""
+    model_config = ConfigDict(frozen=True, revalidate_instances="never", validate_assignment=False, extra="ignore")
+
+
+class FeedDeviceInput(_ToolInput):
     """喂食设备的输入参数"""
     device_id: str = Field(..., description="设备ID，必须指定，通过list_devices工具获取")
     feed_count: int = Field(default=1, description="喂食份数，每份约17g，范围1-10份")
 
 
-class CreateScheduleTaskInput(BaseModel):
+class CreateScheduleTaskInput(_ToolInput):
     """创建定时喂食任务的输入参数"""
     device_id: str = Field(..., description="设备ID")
     feed_count: int = Field(default=1, description="喂食份数，范围1-10")
@@ -37,7 +58,7 @@ class CreateScheduleTaskInput(BaseModel):
     mode: str = Field(default="once", description="once(一次性)或daily(每天循环)")
 
 
-class UpdateScheduleTaskInput(BaseModel):
+class UpdateScheduleTaskInput(_ToolInput):
     """更新定时喂食任务的输入参数"""
     task_id: str = Field(..., description="任务ID")
     device_id: Optional[str] = Field(None, description="新的设备ID")
@@ -46,38 +67,38 @@ class UpdateScheduleTaskInput(BaseModel):
     mode: Optional[str] = Field(None, description="新的任务模式")
 
 
-class DeleteScheduleTaskInput(BaseModel):
+class DeleteScheduleTaskInput(_ToolInput):
     """删除定时喂食任务的输入参数"""
     task_id: str = Field(..., description="要删除的任务ID")
 
 
-class ListScheduleTasksInput(BaseModel):
+class ListScheduleTasksInput(_ToolInput):
     """查询定时喂食任务列表的输入参数"""
     status: Optional[str] = Field(None, description="按状态筛选：pending/completed/failed/cancelled")
     device_id: Optional[str] = Field(None, description="按设备ID筛选")
 
 
-class DeviceStatusInput(BaseModel):
+class DeviceStatusInput(_ToolInput):
     """查询设备状态的输入参数"""
     device_id: str = Field(..., description="设备ID，必须指定，通过list_devices工具获取")
 
 
-class DeviceInfoInput(BaseModel):
+class DeviceInfoInput(_ToolInput):
     """查询设备信息的输入参数"""
     device_id: str = Field(..., description="设备ID，必须指定，通过list_devices工具获取")
 
 
 @tool(args_schema=FeedDeviceInput)
-def feed_device(**kwargs) -> Dict[str, Any]:
+async def feed_device(**kwargs) -> Dict[str, Any]:
     """
     立即执行喂食操作（即时喂食）。
     注意：如果用户说"在某时某分"、"明天"、"每天"等包含时间的请求，应使用create_schedule_task创建定时任务，而不是此工具。
     此工具仅用于"现在喂"、"喂一下"等立即执行的请求。
     """
     try:
-        # 从 kwargs 提取参数
-        device_id = kwargs.get('device_id')
-        feed_count = kwargs.get('feed_count', 1)
+        # 参数类型已由 @tool 按 args_schema 校验过，这里只用 model_construct 补齐默认值
+        inp = FeedDeviceInput.model_construct(**kwargs)
+        device_id, feed_count = inp.device_id, inp.feed_count
         
         if not device_id:
             return {
@@ -85,12 +106,11 @@ def feed_device(**kwargs) -> Dict[str, Any]:
                 "message": "❌ 缺少必需参数 device_id，请先调用 list_devices 获取设备ID"
             }
         
-        from services.feeder_service import get_feeder_service
         service = get_feeder_service()
         
-        logger.info(f"执行喂食: device_id={device_id}, feed_count={feed_count}")
+        logger.info("执行喂食: device_id=%s, feed_count=%s", device_id, feed_count)
         
-        # 验证feed_count
+        # 验证feed_count（与定时任务工具一致，超出范围时返回提示而不是抛校验异常）
         if feed_count <= 0 or feed_count > 10:
             return {
                 "success": False,
@@ -99,8 +119,8 @@ def feed_device(**kwargs) -> Dict[str, Any]:
                 "message": f"❌ 喂食份数必须在1-10之间，当前: {feed_count}"
             }
         
-        # 执行喂食
-        result = service.feed(device_id, feed_count)
+        # 执行喂食（阻塞的HTTP请求放到线程池，避免卡住事件循环上的流式推送）
+        result = await asyncio.to_thread(service.feed, device_id, feed_count)
         
         if result:
             feed_amount_g = feed_count * 17.0
@@ -120,7 +140,7 @@ def feed_device(**kwargs) -> Dict[str, Any]:
             }
             
     except Exception as e:
-        logger.error(f"喂食工具执行失败: {e}", exc_info=True)
+        logger.error("喂食工具执行失败: %s", e, exc_info=True)
         return {
             "success": False,
             "message": f"❌ 喂食失败: {str(e)}"
@@ -146,7 +166,6 @@ def feed_device(**kwargs) -> Dict[str, Any]:
 #                 "message": "❌ 缺少必需参数 device_id，请先调用 list_devices 获取设备ID"
 #             }
 #         
-#         from services.feeder_service import get_feeder_service
 #         service = get_feeder_service()
 #         
 #         status = service.get_device_status(device_id)
@@ -177,23 +196,36 @@ def feed_device(**kwargs) -> Dict[str, Any]:
 #                 "message": f"❌ 无法查询设备状态"
 #             }
 #     except Exception as e:
-#         logger.error(f"查询设备状态失败: {e}", exc_info=True)
+#         logger.error("查询设备状态失败: %s", e, exc_info=True)
 #         return {
 #             "success": False,
 #             "status": {},
 #             "message": f"❌ 查询设备状态失败: {str(e)}"
 #         }
 
+
+# 设备信息回复模板（字段固定，每次调用只做一次格式化）
+_DEVICE_INFO_TEMPLATE = (
+    "📱 设备信息:\n"
+    "设备名称: %s\n"
+    "设备ID: %s\n"
+    "设备类型: %s\n"
+    "固件版本: %s\n"
+    "时区: UTC+%s\n"
+    "网络类型: %s"
+)
+
+
 @tool(args_schema=DeviceInfoInput)
-def get_device_info(**kwargs) -> Dict[str, Any]:
+async def get_device_info(**kwargs) -> Dict[str, Any]:
     """
     获取设备的详细配置信息，包括设备名称、ID、固件版本、时区、网络类型等。
     当用户询问设备配置、固件版本、详细信息时使用此工具。
     必须提供device_id参数，请先使用list_devices工具获取设备ID。
     """
     try:
-        # 从 kwargs 提取参数
-        device_id = kwargs.get('device_id')
+        # 参数已由 @tool 按 args_schema 校验过，不再重复校验
+        device_id = DeviceInfoInput.model_construct(**kwargs).device_id
         
         if not device_id:
             return {
@@ -201,31 +233,24 @@ def get_device_info(**kwargs) -> Dict[str, Any]:
                 "message": "❌ 缺少必需参数 device_id，请先调用 list_devices 获取设备ID"
             }
         
-        from services.feeder_service import get_feeder_service
         service = get_feeder_service()
         
-        # 通过ID查找设备
-        devices = service.get_devices()
-        device = None
-        if devices:
-            for dev in devices:
-                if dev.get('devID') == device_id:
-                    device = dev
-                    break
+        # 通过ID查找设备：优先走服务端带TTL的设备索引，过期时才在线程池中重新拉取列表
+        device = await asyncio.to_thread(service.get_device_by_id, device_id)
         
         if device:
-            info_lines = []
-            info_lines.append(f"设备名称: {device.get('devName', '未知')}")
-            info_lines.append(f"设备ID: {device.get('devID', '未知')}")
-            info_lines.append(f"设备类型: {device.get('devType', '未知')}")
-            info_lines.append(f"固件版本: {device.get('devVersion', '未知')}")
-            info_lines.append(f"时区: UTC+{device.get('devTimeZone', 0)}")
-            info_lines.append(f"网络类型: {device.get('netType', '未知')}")
-            
+            g = device.get
             return {
                 "success": True,
                 "device": device,
-                "message": "📱 设备信息:\n" + "\n".join(info_lines)
+                "message": _DEVICE_INFO_TEMPLATE % (
+                    g('devName', '未知'),
+                    g('devID', '未知'),
+                    g('devType', '未知'),
+                    g('devVersion', '未知'),
+                    g('devTimeZone', 0),
+                    g('netType', '未知'),
+                )
             }
         else:
             return {
@@ -234,7 +259,7 @@ def get_device_info(**kwargs) -> Dict[str, Any]:
                 "message": f"❌ 无法找到设备"
             }
     except Exception as e:
-        logger.error(f"查询设备信息失败: {e}", exc_info=True)
+        logger.error("查询设备信息失败: %s", e, exc_info=True)
         return {
             "success": False,
             "device": None,
@@ -245,7 +270,7 @@ def get_device_info(**kwargs) -> Dict[str, Any]:
 # ==================== 定时喂食任务工具 ====================
 
 @tool(args_schema=CreateScheduleTaskInput)
-def create_schedule_task(**kwargs) -> Dict[str, Any]:
+async def create_schedule_task(**kwargs) -> Dict[str, Any]:
     """
     创建定时喂食任务。当用户说"在几点"、"下午三点"、"明天"、"每天"等包含时间的喂食请求时使用此工具。
     mode="once"为一次性定时任务，mode="daily"为每天循环任务。
@@ -284,24 +309,18 @@ def create_schedule_task(**kwargs) -> Dict[str, Any]:
         
         # 解析时间
         try:
-            scheduled_time = datetime.fromisoformat(scheduled_time_str)
-            if scheduled_time.tzinfo is None:
-                # 如果没有时区，假设是日本时间
-                scheduled_time = TZ.localize(scheduled_time)
-            else:
-                # 转换为日本时区
-                scheduled_time = scheduled_time.astimezone(TZ)
+            scheduled_time = _parse_local_time(scheduled_time_str)
         except ValueError as e:
             return {
                 "success": False,
                 "message": f"❌ 时间格式错误: {scheduled_time_str}，请使用格式如 '2024-01-15T20:20:00'"
             }
         
-        # 调用服务创建任务
-        from services.schedule_service import get_schedule_service
+        # 调用服务创建任务（数据库操作放到线程池，不阻塞事件循环）
         service = get_schedule_service()
         
-        result = service.create_task(
+        result = await asyncio.to_thread(
+            service.create_task,
             device_id=device_id,
             feed_count=feed_count,
             scheduled_time=scheduled_time,
@@ -311,7 +330,7 @@ def create_schedule_task(**kwargs) -> Dict[str, Any]:
         return result
         
     except Exception as e:
-        logger.error(f"创建定时任务失败: {e}", exc_info=True)
+        logger.error("创建定时任务失败: %s", e, exc_info=True)
         return {
             "success": False,
             "message": f"❌ 创建定时任务失败: {str(e)}"
@@ -319,7 +338,7 @@ def create_schedule_task(**kwargs) -> Dict[str, Any]:
 
 
 @tool(args_schema=UpdateScheduleTaskInput)
-def update_schedule_task(**kwargs) -> Dict[str, Any]:
+async def update_schedule_task(**kwargs) -> Dict[str, Any]:
     """
     更新定时喂食任务。只能修改待执行状态的任务。
     """
@@ -349,12 +368,7 @@ def update_schedule_task(**kwargs) -> Dict[str, Any]:
         
         if kwargs.get('scheduled_time'):
             try:
-                scheduled_time = datetime.fromisoformat(kwargs['scheduled_time'])
-                if scheduled_time.tzinfo is None:
-                    scheduled_time = TZ.localize(scheduled_time)
-                else:
-                    scheduled_time = scheduled_time.astimezone(TZ)
-                update_params['scheduled_time'] = scheduled_time
+                update_params['scheduled_time'] = _parse_local_time(kwargs['scheduled_time'])
             except ValueError as e:
                 return {
                     "success": False,
@@ -376,15 +390,14 @@ def update_schedule_task(**kwargs) -> Dict[str, Any]:
             }
         
         # 调用服务更新任务
-        from services.schedule_service import get_schedule_service
         service = get_schedule_service()
         
-        result = service.update_task(task_id=task_id, **update_params)
+        result = await asyncio.to_thread(service.update_task, task_id=task_id, **update_params)
         
         return result
         
     except Exception as e:
-        logger.error(f"更新定时任务失败: {e}", exc_info=True)
+        logger.error("更新定时任务失败: %s", e, exc_info=True)
         return {
             "success": False,
             "message": f"❌ 更新定时任务失败: {str(e)}"
@@ -392,7 +405,7 @@ def update_schedule_task(**kwargs) -> Dict[str, Any]:
 
 
 @tool(args_schema=DeleteScheduleTaskInput)
-def delete_schedule_task(**kwargs) -> Dict[str, Any]:
+async def delete_schedule_task(**kwargs) -> Dict[str, Any]:
     """
     删除定时喂食任务。删除后任务状态变为已取消。
     """
@@ -406,15 +419,14 @@ def delete_schedule_task(**kwargs) -> Dict[str, Any]:
             }
         
         # 调用服务删除任务
-        from services.schedule_service import get_schedule_service
         service = get_schedule_service()
         
-        result = service.delete_task(task_id=task_id)
+        result = await asyncio.to_thread(service.delete_task, task_id=task_id)
         
         return result
         
     except Exception as e:
-        logger.error(f"删除定时任务失败: {e}", exc_info=True)
+        logger.error("删除定时任务失败: %s", e, exc_info=True)
         return {
             "success": False,
             "message": f"❌ 删除定时任务失败: {str(e)}"
@@ -422,7 +434,7 @@ def delete_schedule_task(**kwargs) -> Dict[str, Any]:
 
 
 @tool(args_schema=ListScheduleTasksInput)
-def list_schedule_tasks(**kwargs) -> Dict[str, Any]:
+async def list_schedule_tasks(**kwargs) -> Dict[str, Any]:
     """
     查询定时喂食任务列表。可按状态或设备ID筛选。
     """
@@ -431,15 +443,14 @@ def list_schedule_tasks(**kwargs) -> Dict[str, Any]:
         device_id = kwargs.get('device_id')
         
         # 调用服务查询任务
-        from services.schedule_service import get_schedule_service
         service = get_schedule_service()
         
-        result = service.list_tasks(status=status, device_id=device_id)
+        result = await asyncio.to_thread(service.list_tasks, status=status, device_id=device_id)
         
         return result
         
     except Exception as e:
-        logger.error(f"查询定时任务列表失败: {e}", exc_info=True)
+        logger.error("查询定时任务列表失败: %s", e, exc_info=True)
         return {
             "success": False,
             "tasks": [],
@@ -4,6 +4,11 @@ from services.sensor_service import sensor_service
 from utils.logger import logger
 import httpx
 
+# 支持的传感器类型（集合用于校验，文本用于错误提示，均在模块加载时生成一次）
+_SENSOR_TYPES = ('temperature', 'ph', 'oxygen', 'salinity')
+_VALID_SENSOR_TYPES = frozenset(_SENSOR_TYPES)
+_VALID_SENSOR_TYPES_TEXT = ', '.join(_SENSOR_TYPES)
+
 
 @tool
 async def read_sensor_data(
@@ -20,11 +25,10 @@ async def read_sensor_data(
     Returns:
         str: 传感器读数
     """
-    logger.info(f"工具调用: read_sensor_data, type={sensor_type}, id={sensor_id}")
+    logger.info("工具调用: read_sensor_data, type=%s, id=%s", sensor_type, sensor_id)
     
-    valid_types = ['temperature', 'ph', 'oxygen', 'salinity']
-    if sensor_type not in valid_types:
-        return f"❌ 不支持的传感器类型: {sensor_type}，支持: {', '.join(valid_types)}"
+    if sensor_type not in _VALID_SENSOR_TYPES:
+        return f"❌ 不支持的传感器类型: {sensor_type}，支持: {_VALID_SENSOR_TYPES_TEXT}"
     
     try:
         client = await sensor_service.get_client()
@@ -47,11 +51,11 @@ async def read_sensor_data(
         )
         
     except httpx.TimeoutException:
-        logger.error(f"读取传感器超时: {sensor_type}/{sensor_id}")
+        logger.error("读取传感器超时: %s/%s", sensor_type, sensor_id)
         return f"❌ 读取传感器失败: 设备响应超时"
         
     except Exception as e:
-        logger.error(f"读取传感器失败: {e}")
+        logger.error("读取传感器失败: %s", e)
         return f"❌ 读取传感器失败: {str(e)}"
 
 
@@ -66,7 +70,7 @@ async def read_all_sensors(sensor_id: str = "default") -> str:
     Returns:
         str: 所有传感器读数
     """
-    logger.info(f"工具调用: read_all_sensors, id={sensor_id}")
+    logger.info("工具调用: read_all_sensors, id=%s", sensor_id)
     
     try:
         client = await sensor_service.get_client()
@@ -83,6 +87,6 @@ async def read_all_sensors(sensor_id: str = "default") -> str:
         return result
         
     except Exception as e:
-        logger.error(f"读取所有传感器失败: {e}")
+        logger.error("读取所有传感器失败: %s", e)
         return f"❌ 读取传感器失败: {str(e)}"
 
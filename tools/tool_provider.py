@@ -1,7 +1,10 @@
 """工具注册和管理"""
+import asyncio
+import inspect
 from enum import Enum
-from dataclasses import dataclass
-from typing import Callable, Any, List, Optional
+from dataclasses import dataclass, field
+from typing import Callable, Any, Dict, FrozenSet, List, Optional, Tuple
+from config.settings import settings
 from utils.logger import logger
 
 # 导入所有工具
@@ -18,12 +21,31 @@ from tools.camera_tools import capture_image, start_streaming, stop_streaming
 from tools.sensor_tools import read_sensor_data, read_all_sensors
 
 
-@dataclass
+async def _invoke_tool(tool: Any, kwargs: Dict[str, Any]) -> Any:
+    """调用单个工具：LangChain 工具走 ainvoke，普通函数按是否为协程选择直接 await 或放到线程池"""
+    if hasattr(tool, "ainvoke"):
+        return await tool.ainvoke(kwargs)
+    if inspect.iscoroutinefunction(tool):
+        return await tool(**kwargs)
+    return await asyncio.to_thread(tool, **kwargs)
+
+
+@dataclass(slots=True, frozen=True)
 class ToolInfo:
     """工具信息"""
     name: str
-    func: Callable[..., Any]
+    # LangChain 工具是 pydantic 模型、不可哈希，不参与比较和哈希（名称已唯一）
+    func: Callable[..., Any] = field(compare=False)
     category: str  # feeder, camera, sensor, expert
+    # 读写的共享状态（如 device、schedule），批量调用时据此判断两次调用能否并发
+    reads: FrozenSet[str] = frozenset()
+    writes: FrozenSet[str] = frozenset()
+
+
+# 工具读写的共享状态
+_DEVICE = frozenset({"device"})      # 喂食机设备状态
+_SCHEDULE = frozenset({"schedule"})  # 定时任务
+_CAMERA = frozenset({"camera"})      # 摄像头推流状态
 
 
 class DeviceToolFunction(Enum):
@@ -33,20 +55,20 @@ class DeviceToolFunction(Enum):
     CONSULT_EXPERT = ToolInfo("consult_expert", consult_expert, "expert")
     
     # 喂食机工具 - 即时喂食
-    FEED_DEVICE = ToolInfo("feed_device", feed_device, "feeder")
+    FEED_DEVICE = ToolInfo("feed_device", feed_device, "feeder", writes=_DEVICE)
     # GET_DEVICE_STATUS = ToolInfo("get_device_status", get_device_status, "feeder")  # 暂时禁用：API响应问题
-    GET_DEVICE_INFO = ToolInfo("get_device_info", get_device_info, "feeder")
+    GET_DEVICE_INFO = ToolInfo("get_device_info", get_device_info, "feeder", reads=_DEVICE)
     
     # 喂食机工具 - 定时任务
-    CREATE_SCHEDULE_TASK = ToolInfo("create_schedule_task", create_schedule_task, "feeder")
-    UPDATE_SCHEDULE_TASK = ToolInfo("update_schedule_task", update_schedule_task, "feeder")
-    DELETE_SCHEDULE_TASK = ToolInfo("delete_schedule_task", delete_schedule_task, "feeder")
-    LIST_SCHEDULE_TASKS = ToolInfo("list_schedule_tasks", list_schedule_tasks, "feeder")
+    CREATE_SCHEDULE_TASK = ToolInfo("create_schedule_task", create_schedule_task, "feeder", writes=_SCHEDULE)
+    UPDATE_SCHEDULE_TASK = ToolInfo("update_schedule_task", update_schedule_task, "feeder", writes=_SCHEDULE)
+    DELETE_SCHEDULE_TASK = ToolInfo("delete_schedule_task", delete_schedule_task, "feeder", writes=_SCHEDULE)
+    LIST_SCHEDULE_TASKS = ToolInfo("list_schedule_tasks", list_schedule_tasks, "feeder", reads=_SCHEDULE)
     
     # # 摄像头工具
-    # CAPTURE_IMAGE = ToolInfo("capture_image", capture_image, "camera")
-    # START_STREAMING = ToolInfo("start_streaming", start_streaming, "camera")
-    # STOP_STREAMING = ToolInfo("stop_streaming", stop_streaming, "camera")
+    # CAPTURE_IMAGE = ToolInfo("capture_image", capture_image, "camera", reads=_CAMERA)
+    # START_STREAMING = ToolInfo("start_streaming", start_streaming, "camera", writes=_CAMERA)
+    # STOP_STREAMING = ToolInfo("stop_streaming", stop_streaming, "camera", writes=_CAMERA)
     
     # # 传感器工具
     # READ_SENSOR_DATA = ToolInfo("read_sensor_data", read_sensor_data, "sensor")
@@ -65,18 +87,38 @@ class DeviceToolFunction(Enum):
         return self.value.category
 
 
+# (名称, 工具函数, 类别, 读集合, 写集合) 表，模块加载时从枚举展开一次
+_TOOL_TABLE: Tuple[Tuple[str, Callable[..., Any], str, FrozenSet[str], FrozenSet[str]], ...] = tuple(
+    (t.value.name, t.value.func, t.value.category, t.value.reads, t.value.writes)
+    for t in DeviceToolFunction
+)
+
+_NO_ACCESS: Tuple[FrozenSet[str], FrozenSet[str]] = (frozenset(), frozenset())
+
+
 class ToolRegistry:
     """工具注册表"""
     
     def __init__(self):
-        self._tools = {}
+        self._tools: Dict[str, Any] = {}
+        self._categories: Dict[str, str] = {}
+        self._access: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+        self._by_category: Dict[str, List[Any]] = {}
+        # 批量调用的并发上限：全局一个，每个类别再各一个，避免某类工具的突发调用占满下游或线程池。
+        # 信号量绑定事件循环，首次批量调用时在运行中的循环里创建（见 _semaphores）
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._category_sems: Dict[str, asyncio.Semaphore] = {}
+        self._sem_loop: Optional[asyncio.AbstractEventLoop] = None
         self._register_default_tools()
     
     def _register_default_tools(self):
-        """注册所有默认工具"""
-        for tool_enum in DeviceToolFunction:
-            self._tools[tool_enum.get_name()] = tool_enum.get_func()
-            logger.info(f"注册工具: {tool_enum.get_name()} ({tool_enum.get_category()})")
+        """注册所有默认工具（一次遍历同时建立名称、类别索引）"""
+        for name, func, category, reads, writes in _TOOL_TABLE:
+            self._tools[name] = func
+            self._categories[name] = category
+            self._access[name] = (reads, writes)
+            self._by_category.setdefault(category, []).append(func)
+            logger.info("注册工具: %s (%s)", name, category)
     
     def get_tool(self, name: str):
         """获取单个工具"""
@@ -84,11 +126,7 @@ class ToolRegistry:
     
     def get_tools_by_category(self, category: str) -> List[Any]:
         """按类别获取工具"""
-        return [
-            tool.get_func() 
-            for tool in DeviceToolFunction 
-            if tool.get_category() == category
-        ]
+        return list(self._by_category.get(category, ()))
     
     def get_tools_by_names(self, names: List[str]) -> List[Any]:
         """按名称列表获取工具"""
@@ -98,19 +136,90 @@ class ToolRegistry:
             if tool:
                 tools.append(tool)
             else:
-                logger.warning(f"工具未找到: {name}")
+                logger.warning("工具未找到: %s", name)
         return tools
     
+    def _conflict_dependencies(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[List[int]]:
+        """
+        按工具读写集合推导调用间的先后约束：后一个调用与前面某个调用读写同一状态
+        （写-读、读-写、写-写）时必须等前者完成，其余调用可并发；冲突调用保持模型给出的顺序
+        """
+        access = [self._access.get(name, _NO_ACCESS) for name, _ in calls]
+        deps: List[List[int]] = []
+        for i, (reads_i, writes_i) in enumerate(access):
+            touched_i = reads_i | writes_i
+            deps.append([
+                j for j, (reads_j, writes_j) in enumerate(access[:i])
+                if writes_j & touched_i or writes_i & reads_j
+            ])
+        return deps
+    
+    def _semaphores(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Semaphore]]:
+        """获取当前事件循环的并发信号量（首次调用或事件循环变化时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(settings.TOOL_CONCURRENCY)
+            self._category_sems = {
+                category: asyncio.Semaphore(settings.TOOL_CATEGORY_CONCURRENCY)
+                for category in self._by_category
+            }
+            self._sem_loop = loop
+        return self._sem, self._category_sems
+    
+    async def invoke_many(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        dependencies: Optional[Dict[int, List[int]]] = None
+    ) -> List[Any]:
+        """
+        并发调用多个工具（同一轮中相互独立的调用同时执行）
+        
+        Args:
+            calls: (工具名称, 参数) 列表
+            dependencies: 可选的额外依赖关系 {调用下标: [需先完成的调用下标]}，只能依赖排在前面的调用；
+                读写同一状态的调用之间的依赖会自动推导，无需在此声明
+            
+        Returns:
+            与 calls 顺序一致的结果列表，失败的调用对应位置为异常对象
+        
+        Raises:
+            ValueError: 依赖下标越界，或依赖自身/排在后面的调用（会导致互相等待）
+        """
+        deps_by_index = self._conflict_dependencies(calls)
+        for index, extra in (dependencies or {}).items():
+            if not 0 <= index < len(calls):
+                raise ValueError(f"依赖关系中的调用下标越界: {index}")
+            for j in extra:
+                if not 0 <= j < index:
+                    raise ValueError(f"调用 {index} 只能依赖排在前面的调用，无效的依赖下标: {j}")
+            deps_by_index[index].extend(extra)
+        sem, category_sems = self._semaphores()
+        tasks: List[asyncio.Task] = []
+        
+        async def _run(index: int, name: str, kwargs: Dict[str, Any]) -> Any:
+            deps = [tasks[j] for j in deps_by_index[index]]
+            if deps:
+                # 只等待依赖完成，依赖失败不影响本调用的执行
+                await asyncio.gather(*deps, return_exceptions=True)
+            tool = self._tools.get(name)
+            if tool is None:
+                raise KeyError(f"工具未找到: {name}")
+            async with category_sems[self._categories[name]], sem:
+                return await _invoke_tool(tool, kwargs)
+        
+        # 先创建全部任务再统一等待，依赖下标在任务开始执行前都已可用
+        for index, (name, kwargs) in enumerate(calls):
+            tasks.append(asyncio.create_task(_run(index, name, kwargs)))
+        
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    
     def list_tools(self) -> List[str]:
         """列出所有工具名称"""
         return list(self._tools.keys())
     
     def list_categories(self) -> List[str]:
         """列出所有工具类别"""
-        categories = set()
-        for tool in DeviceToolFunction:
-            categories.add(tool.get_category())
-        return list(categories)
+        return list(self._by_category)
 
 
 # 全局工具注册表实例
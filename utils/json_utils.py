@@ -0,0 +1,13 @@
+"""
+JSON序列化（基于orjson）
+"""
+from typing import Any
+
+import orjson
+
+loads = orjson.loads
+
+
+def dumps(obj: Any) -> str:
+    """序列化为JSON字符串（orjson 直接输出UTF-8，等价于 ensure_ascii=False；允许非字符串键）"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
@@ -1,10 +1,12 @@
 """
 日志配置
 """
+import atexit
 import logging
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config.settings import settings
 
 # 创建日志目录
@@ -39,7 +41,6 @@ file_handler = RotatingFileHandler(
 )
 file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
 # 错误日志文件handler
 error_handler = RotatingFileHandler(
@@ -50,7 +51,14 @@ error_handler = RotatingFileHandler(
 )
 error_handler.setLevel(logging.ERROR)
 error_handler.setFormatter(formatter)
-logger.addHandler(error_handler)
+
+# 文件写入（含日志轮转）交给后台线程：调用方只把记录放入队列，不在事件循环线程上做磁盘IO
+# 控制台handler仍直接挂在logger上，保持同步输出便于调试
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+queue_listener = QueueListener(log_queue, file_handler, error_handler, respect_handler_level=True)
+queue_listener.start()
+atexit.register(queue_listener.stop)
 
 logger.info("日志系统初始化完成")
 